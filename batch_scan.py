@@ -0,0 +1,270 @@
+"""
+Пакетное сканирование каталога без Telegram: читает файл со списком
+приложений и прогоняет все пары (приложение, страна) через общий пул
+запросов с одним лимитом одновременности и лимитом скорости по хостам
+(http_client). Строки цен пишутся в один файл (CSV, JSONL или Parquet - см.
+pricebot.output) по мере готовности, а в файл
+контрольной точки - каждая завершённая пара, так что прерванный прогон
+продолжается с того же места.
+
+Формат входного файла - по одной записи в строке:
+    com.example.app                                   (Google Play)
+    1234567890                                        (App Store)
+    https://play.google.com/store/apps/details?id=... (любая ссылка, как боту)
+    {"store": "apple", "app_id": "1234567890"}        (JSON, поля store/app_id/link)
+Пустые строки и строки с # пропускаются.
+
+Запуск:
+    python batch_scan.py catalog.txt -o prices.csv --concurrency 20
+    python batch_scan.py catalog.txt -o prices.parquet
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Из пакета берётся только движок сканирования: Telegram не загружается
+from pricebot import http_client, metrics
+from pricebot.convert import google_price_parser, convert_prices_batch
+from pricebot.countries import countries
+from pricebot.currency_rates import rate_provider
+from pricebot.fetch import SCAN_DEADLINE, fetch_country_google, get_prices_for_country_apple
+from pricebot.output import PriceRow, open_writer, format_for_path
+from pricebot.parse import parse_app_link
+from pricebot.price_history import price_history
+
+log = logging.getLogger("pricebot")
+
+BATCH_CONCURRENCY = 20  # Пар (приложение, страна) в работе одновременно
+PROGRESS_EVERY = 100    # Как часто печатать прогресс, пар
+
+# Статусы, после которых пара считается завершённой; таймауты и ошибки
+# в контрольную точку не пишутся и повторяются при следующем запуске
+DONE_STATUSES = {'ok', 'noinapp', '404'}
+
+
+def parse_catalog_line(line):
+    """
+    Возвращает (магазин, id приложения) либо None для пустых и нераспознанных строк.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        entry = json.loads(line)
+        if entry.get("link"):
+            return parse_catalog_line(entry["link"])
+        app_id = str(entry.get("app_id", "")).strip()
+        if not app_id:
+            return None
+        return entry.get("store") or ("apple" if app_id.isdigit() else "google"), app_id
+    if "://" in line:
+        store, app_id = parse_app_link(line)
+        return (store, app_id) if app_id else None
+    return ("apple" if line.isdigit() else "google"), line
+
+
+def read_catalog(path):
+    apps = []
+    seen = set()
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, start=1):
+            try:
+                app = parse_catalog_line(line)
+            except ValueError as e:
+                log.warning("Строка %d: не удалось разобрать (%s)", number, e)
+                continue
+            if app is not None and app not in seen:
+                seen.add(app)
+                apps.append(app)
+    return apps
+
+
+def resume_output_path(path, fmt):
+    """
+    CSV и JSONL при возобновлении дописываются; Parquet дописать нельзя,
+    поэтому продолжение пишется в следующий свободный файл prices.1.parquet и т.д.
+    """
+    if fmt != "parquet" or not os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(path)
+    part = 1
+    while os.path.exists(f"{stem}.{part}{ext}"):
+        part += 1
+    return f"{stem}.{part}{ext}"
+
+
+def load_checkpoint(path):
+    """
+    Множество (магазин, приложение, страна), уже записанных в прошлых запусках.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) == 4:
+                done.add(tuple(parts[:3]))
+    return done
+
+
+async def scan_pair(store, app_id, country_code):
+    """
+    Сканирует одну страну одного приложения.
+    Возвращает (статус, строки [(валюта, цена, min_usd, max_usd, имя, длительность)]).
+    """
+    deadline = asyncio.get_running_loop().time() + SCAN_DEADLINE
+    if store == "google":
+        prices, currency_code, success = await fetch_country_google(country_code, app_id, deadline)
+        status = 'ok' if success is True else success
+        if success is not True or not prices:
+            return status, []
+        min_usd, max_usd = convert_prices_batch(
+            google_price_parser, [(price, currency_code) for price in prices], rate_provider.rates
+        )
+        return status, [
+            (currency_code, price, float(low), float(high), '', '')
+            for price, low, high in zip(prices, min_usd, max_usd)
+        ]
+
+    iaps_list = await get_prices_for_country_apple(country_code, app_id, deadline)
+    if iaps_list is None:
+        return 'error', []
+    return ('ok' if iaps_list else 'noinapp'), [
+        (iap["currency_code"], iap["price_str"], iap["min_price_usd"],
+         iap["max_price_usd"], iap["name"], iap["duration"])
+        for iap in iaps_list
+    ]
+
+
+async def run_batch(apps, output_path, checkpoint_path, concurrency=BATCH_CONCURRENCY,
+                    record_history=True, fmt=None):
+    """
+    Прогоняет все пары (приложение, страна), кроме уже отмеченных в контрольной
+    точке. Строки результата дописываются в output_path сразу после ответа
+    страны. Пара отмечается в контрольной точке только после того, как её
+    строки сброшены на диск: при падении между этими шагами строки страны
+    при повторном запуске могут записаться ещё раз, но не потеряются.
+    Файл Parquet читаем только после закрытия, поэтому для него отметки
+    копятся в памяти и пишутся в контрольную точку после закрытия файла.
+    """
+    done = load_checkpoint(checkpoint_path)
+    pairs = ((store, app_id, cc) for store, app_id in apps for cc in countries
+             if (store, app_id, cc) not in done)
+    total = len(apps) * len(countries) - len(done)
+    log.info("Приложений: %d, пар к сканированию: %d, уже готово: %d", len(apps), total, len(done))
+
+    fmt = fmt or format_for_path(output_path)
+    output_path = resume_output_path(output_path, fmt)
+    stats = {"done": 0, "rows": 0, "failed": 0}
+    started = time.monotonic()
+
+    durable = fmt != "parquet"
+    pending_marks = []
+    write_lock = threading.Lock()
+
+    with open(checkpoint_path, mode='a', encoding='utf-8') as checkpoint:
+        try:
+            with open_writer(output_path, fmt, append=True) as writer:
+
+                def write_result(store, app_id, country_code, status, rows):
+                    # Вызывается из потоков сразу нескольких воркеров: writer и
+                    # контрольная точка общие, а строка JSONL или столбцы
+                    # Parquet пишутся не одним вызовом, поэтому запись - под
+                    # замком; строки и отметка пары пишутся вместе
+                    with write_lock:
+                        if rows:
+                            writer.write_rows(
+                                PriceRow(store, app_id, country_code, currency, price_str, min_usd, max_usd,
+                                         name, duration)
+                                for currency, price_str, min_usd, max_usd, name, duration in rows
+                            )
+                        if status in DONE_STATUSES:
+                            mark = f"{store}\t{app_id}\t{country_code}\t{status}\n"
+                            if durable:
+                                writer.flush()
+                                checkpoint.write(mark)
+                                checkpoint.flush()
+                            else:
+                                pending_marks.append(mark)
+                    if record_history and status in DONE_STATUSES:
+                        price_history.record_scan(store, app_id, {country_code: (status, rows)})
+
+                async def worker():
+                    # Все воркеры берут пары из одного генератора: пар в работе
+                    # никогда не больше concurrency, сколько бы приложений ни было
+                    for store, app_id, country_code in pairs:
+                        try:
+                            status, rows = await scan_pair(store, app_id, country_code)
+                        except Exception as e:
+                            log.error("[Batch] %s:%s %s: %r", store, app_id, country_code, e)
+                            status, rows = 'error', []
+                        await asyncio.to_thread(write_result, store, app_id, country_code, status, rows)
+
+                        stats["done"] += 1
+                        stats["rows"] += len(rows)
+                        if status not in DONE_STATUSES:
+                            stats["failed"] += 1
+                        if stats["done"] % PROGRESS_EVERY == 0:
+                            elapsed = time.monotonic() - started
+                            log.info("[Batch] %d/%d пар, строк: %d, без ответа: %d, %.1f пар/с",
+                                     stats['done'], total, stats['rows'], stats['failed'], stats['done'] / elapsed)
+
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            # Отметки Parquet - только после того, как файл закрыт и читаем
+            checkpoint.writelines(pending_marks)
+
+    log.info("[Batch] Готово: %d пар за %.1f с, строк: %d, без ответа (повторятся при следующем запуске): %d",
+             stats['done'], time.monotonic() - started, stats['rows'], stats['failed'])
+    return stats
+
+
+async def main(args):
+    if args.rate is not None:
+        for host in list(http_client.HOST_RATE_LIMITS):
+            http_client.HOST_RATE_LIMITS[host] = args.rate
+        http_client.DEFAULT_HOST_RATE = args.rate
+
+    apps = read_catalog(args.catalog)
+    rate_provider.load_snapshot()
+    await rate_provider.refresh()
+    try:
+        await run_batch(
+            apps,
+            args.output,
+            args.checkpoint or args.output + ".checkpoint",
+            concurrency=args.concurrency,
+            record_history=not args.no_history,
+            fmt=args.format,
+        )
+    finally:
+        await http_client.close_session()
+        price_history.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Пакетное сканирование цен по списку приложений")
+    parser.add_argument("catalog", help="файл со списком приложений")
+    parser.add_argument("-o", "--output", default="batch_prices.csv", help="файл результата")
+    parser.add_argument("--format", choices=("csv", "jsonl", "parquet"),
+                        help="формат результата (по умолчанию - по расширению файла)")
+    parser.add_argument("--checkpoint", help="файл контрольной точки (по умолчанию <output>.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="пар (приложение, страна) в работе одновременно")
+    parser.add_argument("--rate", type=float, help="запросов в секунду на хост (вместо HOST_RATE_LIMITS)")
+    parser.add_argument("--no-history", action="store_true", help="не записывать результаты в историю цен")
+    args = parser.parse_args()
+    log_listener = metrics.setup_logging()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        log.warning("Прервано; повторный запуск продолжит с контрольной точки.")
+        sys.exit(130)
+    finally:
+        log_listener.stop()
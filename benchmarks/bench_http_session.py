@@ -0,0 +1,99 @@
+"""
+Бенчмарк: новая aiohttp.ClientSession на каждую страну против общей сессии
+из http_client. Поднимает локальный stub-сервер и делает столько же запросов,
+сколько делает один скан Google Play (по одному на страну).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_http_session.py --scans 20
+    python benchmarks/bench_http_session.py --certfile cert.pem --keyfile key.pem  # с TLS
+"""
+import argparse
+import asyncio
+import os
+import ssl
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricebot import http_client
+
+COUNTRIES_PER_SCAN = 48
+PAGE = ('<html>"$0.99 - $99.99 per item",' + 'x' * 50_000 + 'In-app purchases</html>').encode()
+
+
+async def page_handler(request):
+    return web.Response(body=PAGE, content_type='text/html')
+
+
+async def start_stub_server(ssl_context=None):
+    app = web.Application()
+    app.router.add_get('/store/apps/details', page_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0, ssl_context=ssl_context)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+async def fetch_with_new_session(url, ssl_param):
+    # Так работали get_prices_for_country_*: новая сессия на каждую страну
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(url, ssl=ssl_param) as response:
+            return await response.text()
+
+
+async def fetch_with_shared_session(url, ssl_param):
+    session = await http_client.get_session()
+    async with session.get(url, ssl=ssl_param) as response:
+        return await response.text()
+
+
+async def run_scans(fetch, base_url, scans, batch_size, ssl_param):
+    started = time.perf_counter()
+    for _ in range(scans):
+        urls = [f'{base_url}/store/apps/details?id=bench&gl={i}' for i in range(COUNTRIES_PER_SCAN)]
+        for i in range(0, len(urls), batch_size):
+            await asyncio.gather(*(fetch(u, ssl_param) for u in urls[i:i + batch_size]))
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scans', type=int, default=10, help='сколько полных сканов выполнить')
+    parser.add_argument('--batch-size', type=int, default=5, help='сколько стран запрашивать одновременно')
+    parser.add_argument('--certfile', help='сертификат для TLS stub-сервера')
+    parser.add_argument('--keyfile', help='ключ для TLS stub-сервера')
+    args = parser.parse_args()
+
+    server_ssl = None
+    scheme = 'http'
+    client_ssl = None
+    if args.certfile and args.keyfile:
+        server_ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_ssl.load_cert_chain(args.certfile, args.keyfile)
+        scheme = 'https'
+        client_ssl = False  # самоподписанный сертификат
+
+    runner, port = await start_stub_server(server_ssl)
+    base_url = f'{scheme}://127.0.0.1:{port}'
+    total_requests = args.scans * COUNTRIES_PER_SCAN
+    try:
+        for name, fetch in (('новая сессия на запрос', fetch_with_new_session),
+                            ('общая сессия', fetch_with_shared_session)):
+            elapsed = await run_scans(fetch, base_url, args.scans, args.batch_size, client_ssl)
+            print(f"{name:>24}: {elapsed:.3f} с всего, "
+                  f"{elapsed / total_requests * 1000:.2f} мс на запрос, "
+                  f"{total_requests / elapsed:.0f} запросов/с")
+    finally:
+        await http_client.close_session()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
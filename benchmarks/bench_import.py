@@ -0,0 +1,140 @@
+"""
+Бенчмарк холодного импорта: сколько стоит `import <модуль>` в новом
+процессе. Короткие пакетные воркеры тратят на импорты большую часть старта,
+поэтому здесь проверяется и то, что движок сканирования (pricebot.fetch)
+не тянет за собой Telegram и тяжёлые необязательные зависимости.
+
+Для каждой цели несколько раз запускается `python -X importtime -c "import
+<цель>"`; печатается медиана времени процесса, время самого импорта и самые
+дорогие модули (по cumulative из -X importtime).
+Результат можно сохранить (--save) и сравнить с прошлым (--compare): при
+ухудшении больше чем на --tolerance скрипт завершается с кодом 1.
+
+Запуск из корня репозитория (нужен config.py, как для бота):
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 15 --top 10
+    python benchmarks/bench_import.py --save import_base.json
+    python benchmarks/bench_import.py --compare import_base.json --tolerance 0.3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = ("pricebot", "pricebot.fetch", "pricebot.bot")
+# Что не должно загружаться вместе с модулем: импортируется лениво, по необходимости
+MUST_NOT_LOAD = {
+    "pricebot": ("telegram", "aiohttp", "numpy", "pricebot.fetch"),
+    "pricebot.fetch": ("telegram", "aiohttp", "numpy", "ijson", "pyarrow", "uvloop"),
+}
+
+
+def run_import(target):
+    """
+    Один холодный импорт в новом процессе. Возвращает (время процесса, с;
+    {модуль: cumulative, мкс}; загруженные модули верхнего уровня и пакета).
+    """
+    code = (
+        f"import sys, json; import {target}; "
+        "print(json.dumps(sorted(m for m in sys.modules if '.' not in m or m.startswith('pricebot.'))))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get("PYTHONPATH")))))
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    elapsed = time.perf_counter() - started
+
+    # Строки -X importtime: "import time: self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        cumulative[module] = max(cumulative.get(module, 0), int(cum))
+    return elapsed, cumulative, set(json.loads(proc.stdout))
+
+
+def bench_target(target, repeat):
+    walls = []
+    imports = []
+    runs = []
+    for _ in range(repeat):
+        elapsed, cumulative, loaded = run_import(target)
+        walls.append(elapsed)
+        imports.append(cumulative.get(target, 0) / 1e6)
+        runs.append(cumulative)
+    # Дорогие модули - по медианному прогону, чтобы не ловить выбросы
+    median_run = runs[sorted(range(repeat), key=lambda i: imports[i])[repeat // 2]]
+    return statistics.median(walls), statistics.median(imports), median_run, loaded
+
+
+def compare(results, baseline, tolerance):
+    return [
+        f"{key}: {baseline[key]:.4g} -> {value:.4g}"
+        for key, value in results.items()
+        if baseline.get(key) and value > baseline[key] * (1 + tolerance)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('targets', nargs='*', default=TARGETS, help='модули для замера')
+    parser.add_argument('--repeat', type=int, default=7, help='запусков на модуль')
+    parser.add_argument('--top', type=int, default=5, help='сколько самых дорогих модулей показывать')
+    parser.add_argument('--save', help='сохранить результат в JSON')
+    parser.add_argument('--compare', help='сравнить с сохранённым результатом')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='допустимое ухудшение при --compare')
+    args = parser.parse_args()
+
+    # Пустой запуск интерпретатора - нижняя граница для времени процесса
+    # (и модули, которые грузит сам старт, например site, в списки не попадают)
+    baseline_wall, _, startup, _ = bench_target("sys", args.repeat)
+    print(f"Пустой интерпретатор: {baseline_wall * 1000:.0f} мс")
+
+    results = {}
+    failures = []
+    for target in args.targets:
+        wall, imported, cumulative, loaded = bench_target(target, args.repeat)
+        results[f"{target}.import_s"] = imported
+        results[f"{target}.process_s"] = wall
+        print(f"\n{target}: импорт {imported * 1000:.1f} мс, процесс {wall * 1000:.0f} мс "
+              f"(медиана из {args.repeat})")
+        top = sorted(
+            (
+                (cum, name) for name, cum in cumulative.items()
+                if name != target and "." not in name and name not in startup
+            ),
+            reverse=True
+        )[:args.top]
+        for cum, name in top:
+            print(f"  {cum / 1000:8.1f} мс  {name}")
+        unexpected = sorted(set(MUST_NOT_LOAD.get(target, ())) & loaded)
+        if unexpected:
+            failures.append(f"{target} загружает {', '.join(unexpected)}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if failures:
+        print("\nЛишние импорты:\n  " + "\n  ".join(failures))
+        return 1
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("\nУхудшения больше допустимого:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nУхудшений нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Микро-бенчмарк разбора цен: прежний create_currency_parsers() (словарь лямбд,
+пересобираемый на каждый вызов) против табличного pricebot.convert.
+Заодно сверяет результаты на корпусе реальных строк цен.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_price_parser.py --repeat 2000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricebot.convert import google_price_parser, apple_price_parser
+
+# Строки цен в том виде, в каком они приходят со страниц Google Play (hl=en)
+GOOGLE_CORPUS = [
+    ("$0.99 - $99.99 per item", "USD"),
+    ("$1.49 - $149.99 per item", "AUD"),
+    ("$1.39 - $139.99 per item", "CAD"),
+    ("$1.68 - $168.98 per item", "NZD"),
+    ("$1.38 - $138.98 per item", "SGD"),
+    ("Rp 15.000 - Rp 1.599.000 per item", "IDR"),
+    ("Rp\xa015.000,00 - Rp\xa01.599.000,00 per item", "IDR"),
+    ("JOD 0.690 - JOD 69.990 per item", "JOD"),
+    ("TRY 32.99 - TRY 3,299.99 per item", "TRY"),
+    ("¥160 - ¥16,000 per item", "JPY"),
+    ("₩1,400 - ₩149,000 per item", "KRW"),
+    ("₹89.00 - ₹8,900.00 per item", "INR"),
+    ("₫26,000 - ₫2,599,000 per item", "VND"),
+    ("HK$8.00 - HK$788.00 per item", "HKD"),
+    ("NT$30 - NT$3,290 per item", "TWD"),
+    ("₪3.90 - ₪399.90 per item", "ILS"),
+    ("R 19,99 - R 1 999,99 per item", "ZAR"),
+    ("EGP 49.99 - EGP 4,999.99 per item", "EGP"),
+    ("PKR 280.00 - PKR 27,999.00 per item", "PKR"),
+    ("NGN 1,500.00 - NGN 149,999.00 per item", "NGN"),
+    ("RUB 99.00 - RUB 9,990.00 per item", "RUB"),
+    ("BRL 5.90 - BRL 599.90 per item", "BRL"),
+    ("MX$19.00 - MX$1,999.00 per item", "MXN"),
+    ("COP 4,200.00 - COP 419,900.00 per item", "COP"),
+    ("THB 35.00 - THB 3,500.00 per item", "THB"),
+    ("UAH 41.99 - UAH 4,199.99 per item", "UAH"),
+    ("VND 26,000 per item", "VND"),
+    ("$4.99 per item", "USD"),
+]
+
+# Строки цен из Sensor Tower API (App Store)
+APPLE_CORPUS = [
+    ("ج.م.‏ ٤٩٫٩٩", "EGP"),
+    ("ج.م.‏ ١٬٢٩٩٫٩٩", "EGP"),
+    ("R$ 5,90", "BRL"),
+    ("R$ 1.299,90", "BRL"),
+    ("US$ 0,99", "DZD"),
+    ("$ 4.900", "COP"),
+    ("$ 1.290", "CLP"),
+    ("$9.99", "USD"),
+    ("1,99 USD", "USD"),
+]
+
+
+def legacy_create_currency_parsers():
+    clean = lambda x: x.replace(' per item', '').replace('\xa0', ' ').strip()
+    return {
+        'IDR': lambda x: float(clean(x).replace('Rp ', '').replace('.', '').replace(',00', '')),
+        'JOD': lambda x: float(clean(x).replace('JOD ', '').replace('.000', '')),
+        'TRY': lambda x: float(clean(x).replace('TRY ', '').replace(',', '')),
+        'JPY': lambda x: float(clean(x).replace('¥', '').replace(',', '')),
+        'KRW': lambda x: float(clean(x).replace('₩', '').replace(',', '')),
+        'INR': lambda x: float(clean(x).replace('₹', '').replace(',', '')),
+        'VND': lambda x: float(clean(x).replace('₫', '').replace(',', '')),
+        'HKD': lambda x: float(clean(x).replace('HK$', '').replace(',', '')),
+        'TWD': lambda x: float(clean(x).replace('NT$', '').replace(',', '')),
+        'USD': lambda x: float(clean(x).replace('$', '')),
+        'AUD': lambda x: float(clean(x).replace('$', '')),
+        'NZD': lambda x: float(clean(x).replace('$', '')),
+        'CAD': lambda x: float(clean(x).replace('$', '')),
+        'SGD': lambda x: float(clean(x).replace('$', '')),
+        'ILS': lambda x: float(clean(x).replace('₪', '').replace(',', '')),
+        'ZAR': lambda x: float(clean(x).replace('R ', '').replace(' ', '').replace(',', '.')),
+        'DEFAULT': lambda x: float(re.search(r'[\d,.]+', clean(x)).group(0).replace(',', ''))
+    }
+
+
+def legacy_parse_google(price_str, currency_code):
+    try:
+        first_range = price_str.split(';')[0].strip()
+        if '-' in first_range:
+            min_price_str, max_price_str = [p.strip() for p in first_range.split('-')]
+        else:
+            min_price_str = max_price_str = first_range
+        parsers = legacy_create_currency_parsers()
+        parser = parsers.get(currency_code, parsers['DEFAULT'])
+        return parser(min_price_str), parser(max_price_str)
+    except Exception:
+        return None
+
+
+def new_parse_google(price_str, currency_code):
+    try:
+        return google_price_parser.parse_range(price_str, currency_code)[:2]
+    except ValueError:
+        return None
+
+
+def new_parse_apple(price_str, currency_code):
+    try:
+        return apple_price_parser.parse(price_str, currency_code)
+    except ValueError:
+        return None
+
+
+def bench(func, corpus, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for price_str, currency_code in corpus:
+            func(price_str, currency_code)
+    elapsed = time.perf_counter() - started
+    return repeat * len(corpus) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000, help='сколько раз прогнать корпус')
+    args = parser.parse_args()
+
+    print("Сверка результатов (Google Play):")
+    for price_str, currency_code in GOOGLE_CORPUS:
+        old, new = legacy_parse_google(price_str, currency_code), new_parse_google(price_str, currency_code)
+        mark = "  " if old == new else "!="
+        print(f"  {mark} {currency_code} {price_str!r}: было {old}, стало {new}")
+    print("Разбор App Store:")
+    for price_str, currency_code in APPLE_CORPUS:
+        print(f"     {currency_code} {price_str!r}: {new_parse_apple(price_str, currency_code)}")
+
+    old_rate = bench(legacy_parse_google, GOOGLE_CORPUS, args.repeat)
+    new_rate = bench(new_parse_google, GOOGLE_CORPUS, args.repeat)
+    print(f"\ncreate_currency_parsers: {old_rate:,.0f} разборов/с")
+    print(f"pricebot.convert:        {new_rate:,.0f} разборов/с (x{new_rate / old_rate:.1f})")
+
+
+if __name__ == '__main__':
+    main()
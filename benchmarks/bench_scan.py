@@ -0,0 +1,227 @@
+"""
+Бенчмарк всего конвейера сканирования без сети: поднимает stub_store.py
+(записанные или синтетические страницы по всем странам), направляет на него
+fetch_prices_google / fetch_prices_apple и меряет:
+  - время полного скана (стена),
+  - p50/p95/p99 времени ответа страны (вместе с повторами),
+  - скорость разбора страниц без сети (страниц/с, МБ/с),
+  - пиковый RSS процесса,
+  - запросов к магазину на одно сканирование (с --budget - с отсечением
+    стран планировщиком, см. scan_planner.py).
+Результат можно сохранить (--save) и сравнить с прошлым (--compare): при
+ухудшении больше чем на --tolerance скрипт завершается с кодом 1.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_scan.py --scans 5
+    python benchmarks/bench_scan.py --error-rate 0.05 --throttle-rate 0.05 --latency 0.2
+    python benchmarks/bench_scan.py --save base.json
+    python benchmarks/bench_scan.py --store google --scans 30 --budget 8
+    python benchmarks/bench_scan.py --compare base.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from pricebot import fetch as bot, http_client
+from pricebot.convert import google_price_parser, apple_price_parser, convert_prices_batch
+from pricebot.countries import countries, country_currency_dict
+from pricebot.currency_rates import rate_provider
+from pricebot.parse import PlayPageScanner, CHUNK_SIZE
+from pricebot.price_history import price_history
+from pricebot.scan_planner import scan_planner
+from pricebot.shared_cache import shared_results
+from stub_store import StubStore
+
+GOOGLE_APP_ID = "bench.app"
+APPLE_APP_ID = "1000000000"
+
+# Метрики, где больше - хуже; для --compare
+LOWER_IS_BETTER = ("scan_wall_s", "country_p50_s", "country_p95_s", "country_p99_s", "requests_per_scan",
+                   "peak_rss_mb")
+HIGHER_IS_BETTER = ("parses_per_s",)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb():
+    # ru_maxrss в Linux - в КБ, в macOS - в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def timed(func, samples):
+    """
+    Оборачивает функцию страны так, чтобы каждое время ответа попадало в samples.
+    """
+    async def wrapper(country_code, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(country_code, *args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+    return wrapper
+
+
+async def bench_scans(store, scans):
+    # Каждое сканирование - новое приложение: без его истории цен планировщик
+    # может опираться только на выученную статистику стран
+    samples = []
+    walls = []
+    if store == "google":
+        bot.get_prices_for_country_google = timed(bot.get_prices_for_country_google, samples)
+        scan = lambda i: bot.fetch_prices_google(f"{GOOGLE_APP_ID}{i}", incremental=False)
+    else:
+        bot.get_prices_for_country_apple = timed(bot.get_prices_for_country_apple, samples)
+        scan = lambda i: bot.fetch_prices_apple(f"{APPLE_APP_ID}{i}", incremental=False)
+
+    for i in range(scans):
+        started = time.perf_counter()
+        await scan(i)
+        walls.append(time.perf_counter() - started)
+    return walls, samples
+
+
+def bench_parsing(stub, store, repeat):
+    """
+    Разбор уже полученных страниц без сети: сканер страницы Play или
+    json.loads ответа Sensor Tower плюс пакетная конвертация цен.
+    """
+    pages = [(cc, country_currency_dict.get(cc, "USD"), stub.page(store, cc)) for cc in countries]
+    total_bytes = sum(len(body) for _, _, body in pages) * repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for country_code, currency_code, body in pages:
+            if store == "google":
+                scanner = PlayPageScanner()
+                for i in range(0, len(body), CHUNK_SIZE):
+                    scanner.feed_bytes(body[i:i + CHUNK_SIZE])
+                scanner.close()
+                items = [(price, currency_code) for price in scanner.prices]
+                convert_prices_batch(google_price_parser, items, rate_provider.rates)
+            else:
+                iaps = json.loads(body).get("top_in_app_purchases", {}).get(country_code) or []
+                items = [(iap.get("price", ""), currency_code) for iap in iaps]
+                convert_prices_batch(apple_price_parser, items, rate_provider.rates)
+    elapsed = time.perf_counter() - started
+    return len(pages) * repeat / elapsed, total_bytes / elapsed / 1e6
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, value in results.items():
+        old = baseline.get(key)
+        if not old:
+            continue
+        if key.endswith(LOWER_IS_BETTER) and value > old * (1 + tolerance):
+            regressions.append(f"{key}: {old:.4g} -> {value:.4g}")
+        elif key.endswith(HIGHER_IS_BETTER) and value < old * (1 - tolerance):
+            regressions.append(f"{key}: {old:.4g} -> {value:.4g}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', choices=('google', 'apple', 'both'), default='both')
+    parser.add_argument('--scans', type=int, default=3, help='сколько полных сканов на магазин')
+    parser.add_argument('--parse-repeat', type=int, default=5, help='проходов по всем страницам при замере разбора')
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка ответа stub-сервера, сек')
+    parser.add_argument('--jitter', type=float, default=0.02, help='случайная добавка к задержке, сек')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='доля ответов 429')
+    parser.add_argument('--retry-after', type=float, default=0, help='Retry-After у ответов 429, сек')
+    parser.add_argument('--slow', default='', help='страны через запятую с дополнительной задержкой')
+    parser.add_argument('--slow-extra', type=float, default=1.0, help='дополнительная задержка медленных стран, сек')
+    parser.add_argument('--not-found', default='', help='страны через запятую, где страница приложения не найдена')
+    parser.add_argument('--rate', type=float, default=1000.0, help='лимит запросов в секунду к stub-серверу')
+    parser.add_argument('--budget', type=int, help='SCAN_BUDGET: сканировать с отсечением стран планировщиком')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='сохранить результат в JSON')
+    parser.add_argument('--compare', help='сравнить с сохранённым результатом')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='допустимое ухудшение при --compare')
+    parser.add_argument('--verbose', action='store_true', help='не глушить вывод сканеров')
+    args = parser.parse_args()
+
+    # Сканеры пишут в лог по каждой стране; в бенчмарке это только шум
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    http_client.DEFAULT_HOST_RATE = args.rate
+    bot.SCAN_BUDGET = args.budget
+    stub = StubStore(
+        country_currency_dict, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+        slow_countries=[cc for cc in args.slow.split(',') if cc], slow_extra=args.slow_extra,
+        not_found=[cc for cc in args.not_found.split(',') if cc], seed=args.seed,
+    )
+    await stub.start()
+    bot.GOOGLE_URL = stub.google_url
+    bot.APPLE_URL = stub.apple_url
+
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Ничего из бенчмарка не должно попадать в рабочие данные бота:
+        # ни файлы результатов (CONST_PATH), ни история цен, ни статистика
+        # планировщика, ни общий индекс результатов
+        config.CONST_PATH = data_dir
+        price_history.path = os.path.join(data_dir, "history.sqlite3")
+        scan_planner.path = os.path.join(data_dir, "planner_stats.json")
+        shared_results.path = os.path.join(data_dir, "shared_cache.sqlite3")
+        try:
+            for store in (("google", "apple") if args.store == "both" else (args.store,)):
+                requests_before = stub.stats["requests"]
+                walls, samples = await bench_scans(store, args.scans)
+                requests = stub.stats["requests"] - requests_before
+                parses, megabytes = bench_parsing(stub, store, args.parse_repeat)
+                results.update({
+                    f"{store}.scan_wall_s": sum(walls) / len(walls),
+                    f"{store}.country_p50_s": percentile(samples, 0.50),
+                    f"{store}.country_p95_s": percentile(samples, 0.95),
+                    f"{store}.country_p99_s": percentile(samples, 0.99),
+                    f"{store}.parses_per_s": parses,
+                    f"{store}.requests_per_scan": requests / len(walls),
+                })
+                print(f"[{store}] скан: {results[f'{store}.scan_wall_s']:.3f} с (среднее из {len(walls)}), "
+                      f"страна p50/p95/p99: {results[f'{store}.country_p50_s'] * 1000:.0f}/"
+                      f"{results[f'{store}.country_p95_s'] * 1000:.0f}/"
+                      f"{results[f'{store}.country_p99_s'] * 1000:.0f} мс, "
+                      f"разбор: {parses:.0f} страниц/с ({megabytes:.1f} МБ/с), "
+                      f"запросов на скан: {requests / len(walls):.1f}")
+        finally:
+            price_history.close()
+            shared_results.close()
+            await http_client.close_session()
+            await stub.stop()
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    print(f"Запросов к stub: {stub.stats['requests']}, 503: {stub.stats['errors']}, "
+          f"429: {stub.stats['throttled']}, отдано {stub.stats['bytes'] / 1e6:.1f} МБ")
+    print(f"Пиковый RSS: {results['peak_rss_mb']:.1f} МБ")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("Ухудшения больше допустимого:\n  " + "\n  ".join(regressions))
+            return 1
+        print("Ухудшений нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,61 @@
+"""
+Записывает настоящие страницы Google Play и ответы Sensor Tower по всем
+странам в benchmarks/fixtures, чтобы stub_store.py отдавал их вместо
+синтетических. Нужна сеть; дальше бенчмарки работают без неё.
+
+Запуск из корня репозитория:
+    python benchmarks/record_fixtures.py --google com.example.app --apple 1234567890
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricebot import http_client
+from pricebot.countries import countries
+from pricebot.fetch import GOOGLE_URL, APPLE_URL
+from stub_store import google_fixture_path, apple_fixture_path
+
+
+async def record(url, path):
+    async def save(response):
+        if response.status != 200:
+            return f"HTTP {response.status}, не сохранено"
+        body = await response.read()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(body)
+        return f"{len(body)} байт"
+
+    try:
+        return await http_client.fetch_with_retry(url, save)
+    except Exception as e:
+        return repr(e)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--google', help='id приложения Google Play')
+    parser.add_argument('--apple', help='id приложения App Store')
+    args = parser.parse_args()
+
+    jobs = []
+    for country_code in countries:
+        if args.google:
+            jobs.append((f"google {country_code}", GOOGLE_URL.format(app_id=args.google, country_code=country_code),
+                         google_fixture_path(country_code)))
+        if args.apple:
+            jobs.append((f"apple {country_code}", APPLE_URL.format(apple_id=args.apple, country_code=country_code),
+                         apple_fixture_path(country_code)))
+    try:
+        results = await asyncio.gather(*(record(url, path) for _, url, path in jobs))
+    finally:
+        await http_client.close_session()
+    for (name, _, _), result in zip(jobs, results):
+        print(f"{name}: {result}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
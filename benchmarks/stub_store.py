@@ -0,0 +1,216 @@
+"""
+Локальный stub-сервер Google Play и Sensor Tower для бенчмарков и прогонов
+без сети. Отдаёт записанные страницы из benchmarks/fixtures (см.
+record_fixtures.py), а для стран без записи - синтетическую страницу того
+же вида и размера. Умеет добавлять задержку, ответы 5xx и 429, и отдаёт
+страницы в gzip, если клиент его принимает (как настоящий Play).
+
+Адреса для config (или для подмены GOOGLE_URL/APPLE_URL/RATES_URL в коде):
+    {base_url}/store/apps/details?id={app_id}&hl=en&gl={country_code}
+    {base_url}/api/ios/apps/{apple_id}?country={country_code}
+    {base_url}/rates/usd.json  (курсы в формате currency-api, по DEFAULT_RATES)
+"""
+import asyncio
+import gzip
+import json
+import os
+import random
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricebot.convert import GOOGLE_SPECS, APPLE_SPECS, DEFAULT_SPEC
+from pricebot.currency_rates import DEFAULT_RATES
+from pricebot.parse import INAPP_MARKER, NOT_FOUND_MARKER
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+GOOGLE_PAGE_SIZE = 600_000  # Примерный размер настоящей страницы Play, байт
+PRICE_TIERS = (0.99, 4.99, 9.99, 19.99, 49.99, 99.99)
+# Региональные цены: во сколько раз цена страны ниже или выше долларовой.
+# Для стран не из списка уровень случайный, но постоянный
+REGIONAL_LEVELS = {"EG": 0.35, "PK": 0.38, "TR": 0.4, "NG": 0.42, "IN": 0.5, "ID": 0.55, "VN": 0.55}
+
+
+def google_fixture_path(country_code):
+    return os.path.join(FIXTURES_DIR, "google", f"{country_code}.html")
+
+
+def apple_fixture_path(country_code):
+    return os.path.join(FIXTURES_DIR, "apple", f"{country_code}.json")
+
+
+def format_price(amount, currency_code, spec):
+    text = f"{amount:,.2f}"
+    thousands = spec.get("thousands_sep") or ""
+    decimal = spec.get("decimal_sep") or "."
+    text = text.replace(",", "\0").replace(".", decimal).replace("\0", thousands)
+    return f"{currency_code} {text}"
+
+
+def regional_level(country_code):
+    level = REGIONAL_LEVELS.get(country_code)
+    return level if level is not None else random.Random(country_code).uniform(0.6, 1.3)
+
+
+def filler_text(seed, size):
+    """
+    Псевдослучайная разметка: сжимается gzip примерно так же, как настоящая
+    страница, а не в сотни раз, как повтор одного символа.
+    """
+    rng = random.Random(seed)
+    words = ["div", "span", "class", "data", "href", "style", "null", "true", "false", "[[", "]]",
+             "AF_initDataCallback", "https://play-lh.googleusercontent.com/", "\\u003d", "en_US"]
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(words) if rng.random() < 0.6 else f"{rng.getrandbits(32):x}"
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)[:max(0, size)]
+
+
+def synthetic_google_page(country_code, currency_code):
+    """
+    Страница с блоком In-app purchases и диапазоном цен, дополненная до
+    GOOGLE_PAGE_SIZE, чтобы разбор стоил столько же, сколько на настоящей.
+    """
+    rate = DEFAULT_RATES.get(currency_code, 1.0) * regional_level(country_code)
+    spec = GOOGLE_SPECS.get(currency_code, DEFAULT_SPEC)
+    low = format_price(PRICE_TIERS[0] * rate, currency_code, spec)
+    high = format_price(PRICE_TIERS[-1] * rate, currency_code, spec)
+    head = f'<html><head><title>{country_code}</title></head><body><div>{INAPP_MARKER}</div>'
+    data = f'<script>AF_initDataCallback({{data:["{low} - {high} per item",null]}});</script>'
+    padding = '<div class="filler">' + filler_text(country_code, GOOGLE_PAGE_SIZE - len(head) - len(data)) + '</div>'
+    return (head + padding[:len(padding) // 2] + data + padding[len(padding) // 2:] + '</body></html>').encode()
+
+
+def synthetic_apple_json(country_code, currency_code):
+    rate = DEFAULT_RATES.get(currency_code, 1.0) * regional_level(country_code)
+    spec = APPLE_SPECS.get(currency_code, DEFAULT_SPEC)
+    iaps = [
+        {"name": f"Pack {i + 1}", "price": format_price(tier * rate, currency_code, spec), "duration": ""}
+        for i, tier in enumerate(PRICE_TIERS)
+    ]
+    return json.dumps({"app_id": 0, "top_in_app_purchases": {country_code: iaps}}).encode()
+
+
+class StubStore:
+    """
+    latency/jitter - задержка ответа, сек; error_rate и throttle_rate - доли
+    ответов 503 и 429 (у 429 заголовок Retry-After: retry_after);
+    slow_countries - страны, к задержке которых добавляется slow_extra.
+    """
+
+    def __init__(self, currencies, latency=0.05, jitter=0.02, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=0, slow_countries=(), slow_extra=1.0, not_found=(), compress=True, seed=None):
+        self.currencies = currencies
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.slow_countries = set(slow_countries)
+        self.slow_extra = slow_extra
+        self.not_found = set(not_found)
+        self.compress = compress
+        self.random = random.Random(seed)
+        self.rates = dict(DEFAULT_RATES)  # Что отдаёт /rates/usd.json; можно подменить
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "bytes": 0}
+        self._pages = {}
+        self._gzipped = {}
+        self._runner = None
+        self.base_url = None
+
+    def page(self, store, country_code):
+        key = (store, country_code)
+        body = self._pages.get(key)
+        if body is None:
+            currency_code = self.currencies.get(country_code, "USD")
+            path = google_fixture_path(country_code) if store == "google" else apple_fixture_path(country_code)
+            if os.path.exists(path):
+                with open(path, 'rb') as file:
+                    body = file.read()
+            elif store == "google":
+                body = synthetic_google_page(country_code, currency_code)
+            else:
+                body = synthetic_apple_json(country_code, currency_code)
+            self._pages[key] = body
+        return body
+
+    def gzipped_page(self, store, country_code):
+        key = (store, country_code)
+        body = self._gzipped.get(key)
+        if body is None:
+            body = self._gzipped[key] = gzip.compress(self.page(store, country_code), compresslevel=6)
+        return body
+
+    async def _respond(self, request, store, country_code, content_type):
+        self.stats["requests"] += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if country_code in self.slow_countries:
+            delay += self.slow_extra
+        await asyncio.sleep(delay)
+
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        if roll < self.throttle_rate + self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503)
+        headers = {}
+        if country_code in self.not_found:
+            if store == "apple":
+                return web.Response(status=404)
+            body = f'<html>{INAPP_MARKER}<p>{NOT_FOUND_MARKER}</p></html>'.encode()
+        elif self.compress and "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = self.gzipped_page(store, country_code)
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body = self.page(store, country_code)
+        self.stats["bytes"] += len(body)
+        return web.Response(body=body, content_type=content_type, headers=headers)
+
+    async def google_handler(self, request):
+        return await self._respond(request, "google", request.query.get("gl", "US"), "text/html")
+
+    async def apple_handler(self, request):
+        return await self._respond(request, "apple", request.query.get("country", "US"), "application/json")
+
+    async def rates_handler(self, request):
+        self.stats["requests"] += 1
+        if self.random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503)
+        return web.json_response({"usd": {code.lower(): rate for code, rate in self.rates.items()}})
+
+    async def start(self, host='127.0.0.1', port=0):
+        app = web.Application()
+        app.router.add_get('/store/apps/details', self.google_handler)
+        app.router.add_get('/api/ios/apps/{apple_id}', self.apple_handler)
+        app.router.add_get('/rates/usd.json', self.rates_handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.base_url = f'http://{host}:{site._server.sockets[0].getsockname()[1]}'
+        return self.base_url
+
+    @property
+    def google_url(self):
+        return self.base_url + '/store/apps/details?id={app_id}&hl=en&gl={country_code}'
+
+    @property
+    def apple_url(self):
+        return self.base_url + '/api/ios/apps/{apple_id}?country={country_code}'
+
+    @property
+    def rates_url(self):
+        return self.base_url + '/rates/usd.json'
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,60 @@
+"""
+Сканер цен встроенных покупок Google Play и App Store и Telegram-бот к нему.
+
+Модули:
+    countries  - страны сканирования и их валюты
+    fetch      - сканирование магазинов по странам (без Telegram)
+    parse      - разбор страниц Play и ответов Sensor Tower, ссылки на приложения
+    convert    - разбор строк цен и перевод в USD
+    output     - строки результата, запись CSV/JSONL/Parquet, файлы для бота
+    bot        - Telegram-бот: команды, очередь задач, запуск
+и вспомогательные: http_client, currency_rates, price_cache, shared_cache,
+price_history, scan_planner, scan_progress, job_queue, admission, hedging, metrics.
+
+Импорт пакета ничего тяжёлого не загружает: telegram.ext импортирует только
+bot, aiohttp - первый запрос или endpoint метрик, numpy, ijson и pyarrow -
+код, которому они действительно нужны (см. optional_module). Поэтому пакетные
+задачи берут движок сканирования из pricebot.fetch, не загружая Telegram.
+Имена из _EXPORTS доступны и как pricebot.<имя>: модуль импортируется при
+первом обращении.
+"""
+import functools
+import importlib
+
+# Имя -> модуль пакета, в котором оно определено
+_EXPORTS = {
+    "countries": "countries",
+    "country_currency_dict": "countries",
+    "fetch_prices_google": "fetch",
+    "fetch_prices_apple": "fetch",
+    "run_scan": "fetch",
+    "PriceRow": "output",
+    "open_writer": "output",
+    "main": "bot",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def optional_module(name):
+    """
+    Импортирует необязательную зависимость при первом обращении; None, если
+    она не установлена. Результат запоминается, так что повторные вызовы
+    в горячем коде ничего не стоят.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
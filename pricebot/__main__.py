@@ -0,0 +1,4 @@
+# python -m pricebot - запуск Telegram-бота
+from .bot import main
+
+main()
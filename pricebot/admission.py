@@ -0,0 +1,67 @@
+import math
+import time
+from collections import deque
+import config
+
+# ----------------- Контроль допуска запросов -----------------
+
+USER_MAX_REQUESTS = getattr(config, "USER_MAX_REQUESTS", 5)    # Сканирований на пользователя...
+USER_PERIOD = getattr(config, "USER_PERIOD_SECONDS", 60)       # ...за это окно, сек (как в main.go)
+MAX_ACTIVE_SCANS = getattr(config, "MAX_ACTIVE_SCANS", 50)     # Всего задач в очереди и в работе
+SATURATED_RETRY_AFTER = 60                                     # Через сколько повторить при перегрузке
+
+
+class AdmissionController:
+    """
+    Решает, принимать ли новое сканирование: скользящее окно запросов на
+    пользователя (аналог checkUserRateLimit из main.go) и общий предел
+    сканирований в системе. Отказ возвращается сразу вместе с тем, через
+    сколько секунд имеет смысл повторить.
+    """
+
+    def __init__(self, max_requests=USER_MAX_REQUESTS, period=USER_PERIOD, max_active=MAX_ACTIVE_SCANS):
+        self.max_requests = max_requests
+        self.period = period
+        self.max_active = max_active
+        self._requests = {}  # user_id -> deque времён принятых запросов
+        self._last_cleanup = 0.0
+
+    def _window(self, user_id, now):
+        times = self._requests.get(user_id)
+        if times is None:
+            times = self._requests[user_id] = deque()
+        cutoff = now - self.period
+        while times and times[0] <= cutoff:
+            times.popleft()
+        return times
+
+    def admit(self, user_id, active_scans):
+        """
+        Возвращает (True, 0) и учитывает запрос, либо (False, retry_after_секунд).
+        active_scans - сколько сканирований сейчас в очереди и в работе.
+        """
+        now = time.monotonic()
+        if active_scans >= self.max_active:
+            return False, SATURATED_RETRY_AFTER
+
+        times = self._window(user_id, now)
+        if len(times) >= self.max_requests:
+            return False, max(1, math.ceil(times[0] + self.period - now))
+
+        times.append(now)
+        return True, 0
+
+    def cleanup(self):
+        """
+        Забывает пользователей без запросов в текущем окне (не чаще раза за окно).
+        """
+        now = time.monotonic()
+        if now - self._last_cleanup < self.period:
+            return
+        self._last_cleanup = now
+        for user_id in list(self._requests):
+            if not self._window(user_id, now):
+                del self._requests[user_id]
+
+
+admission = AdmissionController()
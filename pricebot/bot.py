@@ -0,0 +1,373 @@
+import asyncio
+import logging
+import time
+from telegram.ext import (
+    ApplicationBuilder,
+    CommandHandler,
+    MessageHandler,
+    filters
+)
+import config
+from . import http_client, metrics, optional_module
+from .admission import admission
+from .currency_rates import rate_provider
+from .fetch import run_scan, cached_progress, cancel_scans
+from .hedging import hedge_budget
+from .job_queue import ScanJobQueue
+from .output import ResultFile
+from .parse import LINK_ERRORS, parse_app_link
+from .price_cache import result_cache
+from .price_history import price_history
+from .scan_progress import DebouncedEditor
+from .shared_cache import shared_results
+
+# Telegram-бот - единственный модуль пакета, который импортирует telegram.ext.
+# Само сканирование - в pricebot.fetch.
+
+log = logging.getLogger("pricebot")
+
+# Использовать uvloop, если он установлен
+USE_UVLOOP = getattr(config, "USE_UVLOOP", True)
+# Показывать ход сканирования, правя сообщение статуса задачи (см. scan_progress.py)
+PROGRESS_UPDATES = getattr(config, "PROGRESS_UPDATES", True)
+# Сколько самых дешёвых стран показывать в сообщении статуса
+PROGRESS_TOP = getattr(config, "PROGRESS_TOP", 5)
+# /cheapest: сколько стран отдавать по умолчанию и не больше скольких
+CHEAPEST_DEFAULT_K = getattr(config, "CHEAPEST_DEFAULT_K", 5)
+CHEAPEST_MAX_K = 20
+
+# ----------------- Телеграм-бот -----------------
+
+
+async def start(update, context):
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=(
+            "Привет! Отправьте ссылку на приложение из Google Play "
+            "(формата https://play.google.com/store/apps/details?id=xxx) "
+            "или из App Store (формата https://apps.apple.com/xx/app/yyy/idNNNN).\n"
+            "/cheapest <ссылка> [K] - только K самых дешёвых стран, как только они станут ясны."
+        )
+    )
+
+
+STORE_NAMES = {"google": "Google Play", "apple": "App Store"}
+
+
+def cheapest_lines(top):
+    return [
+        f"{place}. {country_code}: ${min_usd:.2f} ({price_str})"
+        for place, (min_usd, country_code, price_str, _) in enumerate(top, start=1)
+    ]
+
+
+def progress_text(job, progress):
+    """
+    Текст сообщения статуса: сколько стран проверено и самые дешёвые на сейчас.
+    """
+    lines = [
+        f"{STORE_NAMES[job.store]} {job.app_id}: проверено стран {len(progress.done)} из {len(progress.countries)}"
+    ]
+    top = progress.cheapest(job.top_k or PROGRESS_TOP)
+    if top:
+        lines.append("Самые дешёвые:" if progress.finished else "Самые дешёвые на сейчас:")
+        lines.extend(cheapest_lines(top))
+    return "\n".join(lines)
+
+
+async def run_job(bot, job, track=None):
+    """
+    run_scan для задачи очереди. Если у задачи есть сообщение статуса, оно
+    правится по ходу сканирования (не чаще PROGRESS_EDIT_INTERVAL).
+    track - ScanJobQueue.track для сканирований, переживших задачу.
+    """
+    listener = None
+    if PROGRESS_UPDATES and job.message_id:
+        editor = DebouncedEditor(
+            lambda text: bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.message_id)
+        )
+        listener = lambda progress: editor.update(progress_text(job, progress))
+    return await run_scan(job.store, job.app_id, listener, job.top_k, track)
+
+
+async def send_cheapest(bot, chat_id, store, app_id, top_k, progress):
+    top = progress.cheapest(top_k) if progress is not None else []
+    if not top:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=f"Информация о ценах для приложения {app_id} не найдена или страница недоступна."
+        )
+        return
+    text = f"Самые дешёвые страны {STORE_NAMES[store]} для {app_id}:\n" + "\n".join(cheapest_lines(top))
+    if len(progress.done) < len(progress.countries):
+        text += (
+            f"\n\nПроверено стран: {len(progress.done)} из {len(progress.countries)}; "
+            "остальные по прошлым сканированиям заметно дороже."
+        )
+    await bot.send_message(chat_id=chat_id, text=text)
+
+
+async def send_result(bot, chat_id, app_id, result):
+    """
+    Отправляет ResultFile документом; файл с диска читается в пуле потоков,
+    а в Telegram уходит из памяти.
+    """
+    data = None
+    if result is not None:
+        try:
+            data = await result.read()
+        except OSError as e:
+            log.warning("Не удалось прочитать результат %s: %s", result.path, e)
+    if data is not None:
+        with metrics.span("upload"):
+            await bot.send_document(chat_id=chat_id, document=data, filename=result.name)
+    else:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=f"Информация о ценах для приложения {app_id} не найдена или страница недоступна."
+        )
+
+
+async def submit_scan(update, context, store, app_id, top_k=None):
+    """
+    Отдаёт результат из кэша сразу (без учёта в лимитах), иначе проверяет
+    лимиты и ставит сканирование в очередь. Возвращает исход для метрик.
+    top_k - ответить только top_k самыми дешёвыми странами.
+    """
+    filepath = await result_cache.get(store, app_id)
+    if filepath:
+        await update.message.reply_text("Возвращаем данные из кэша...")
+        if top_k:
+            progress = await cached_progress(store, app_id)
+            await send_cheapest(context.bot, update.effective_chat.id, store, app_id, top_k, progress)
+        else:
+            await send_result(context.bot, update.effective_chat.id, app_id, ResultFile.from_path(filepath))
+        return "cached"
+
+    scan_queue = context.bot_data["scan_queue"]
+    admitted, retry_after = admission.admit(update.effective_user.id, scan_queue.active)
+    if not admitted:
+        await update.message.reply_text(
+            f"⏳ Слишком много запросов. Попробуйте снова через {retry_after} сек."
+        )
+        return "rejected"
+
+    # Сообщение статуса отправляется до постановки в очередь, чтобы воркер
+    # сразу знал, какое сообщение править по ходу сканирования. Позиция
+    # дописывается в него до того, как воркер сможет взять задачу, иначе
+    # эта правка могла бы затереть ход сканирования
+    status = await update.message.reply_text(f"Запрос для {STORE_NAMES[store]} принят.")
+
+    async def announce(position):
+        # Задача уже в базе: ошибка правки не должна выглядеть как сбой запроса
+        try:
+            await status.edit_text(
+                f"Запрос для {STORE_NAMES[store]} поставлен в очередь, позиция: {position}. "
+                + ("Ход сканирования будет виден в этом сообщении, результат пришлём сюда же."
+                   if PROGRESS_UPDATES else "Результат пришлём сюда же.")
+            )
+        except Exception as e:
+            log.warning("Не удалось сообщить позицию в очереди: %s", e)
+
+    await scan_queue.enqueue(
+        update.effective_user.id, update.effective_chat.id, store, app_id,
+        top_k=top_k, message_id=status.message_id, on_queued=announce
+    )
+    return "queued"
+
+
+DIFF_MAX_LINES = 50  # Больше строк в ответ на /diff не выводим
+
+
+async def diff_command(update, context):
+    """
+    /diff <ссылка> - страны, где цены изменились между двумя последними сканированиями.
+    """
+    store, app_id = parse_app_link(" ".join(context.args))
+    if app_id is None:
+        await update.message.reply_text(
+            LINK_ERRORS[store] if store else "Использование: /diff <ссылка на Google Play или App Store>"
+        )
+        return
+
+    changes = await asyncio.to_thread(price_history.diff, store, app_id)
+    if not changes:
+        await update.message.reply_text(
+            f"Для {app_id} изменений цен между двумя последними сканированиями нет."
+        )
+        return
+
+    lines = [
+        f"{country}: {', '.join(old) or '—'} → {', '.join(new) or '—'}"
+        for country, old, new in changes[:DIFF_MAX_LINES]
+    ]
+    if len(changes) > DIFF_MAX_LINES:
+        lines.append(f"...и ещё {len(changes) - DIFF_MAX_LINES} стран")
+    await update.message.reply_text(
+        f"Изменения цен {STORE_NAMES[store]} для {app_id}:\n" + "\n".join(lines)
+    )
+
+
+async def cheapest_command(update, context):
+    """
+    /cheapest <ссылка> [K] - только K самых дешёвых стран. Ответ приходит, как
+    только они устоялись, не дожидаясь остальных стран.
+    """
+    args = list(context.args)
+    top_k = CHEAPEST_DEFAULT_K
+    if len(args) > 1 and args[-1].isdigit():
+        top_k = min(max(int(args.pop()), 1), CHEAPEST_MAX_K)
+    store, app_id = parse_app_link(" ".join(args))
+    if app_id is None:
+        await update.message.reply_text(
+            LINK_ERRORS[store] if store else "Использование: /cheapest <ссылка на Google Play или App Store> [K]"
+        )
+        return
+    outcome = "error"
+    try:
+        outcome = await submit_scan(update, context, store, app_id, top_k)
+    finally:
+        metrics.requests_total.inc(outcome=outcome)
+
+
+async def handle_message(update, context):
+    start_time = time.time()
+    outcome = "error"
+    username = full_name = "неизвестный"
+    try:
+        text = update.message.text
+
+        user = update.effective_user
+        username = user.username if user.username else "неизвестный"
+        full_name = f"{user.first_name} {user.last_name if user.last_name else ''}".strip()
+
+        store, app_id = parse_app_link(text)
+        if store is None:
+            outcome = "unrecognized"
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="Ссылка не распознана. Отправьте ссылку на приложение Google Play или App Store."
+            )
+        elif app_id is None:
+            outcome = "bad_link"
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=LINK_ERRORS[store])
+        else:
+            outcome = await submit_scan(update, context, store, app_id)
+    except Exception as e:
+        log.exception("Ошибка в обработке сообщения: %s", e)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="Произошла ошибка при обработке вашего запроса."
+        )
+    finally:
+        await result_cache.maybe_cleanup()
+        admission.cleanup()
+        end_time = time.time()
+        total_time = end_time - start_time
+        metrics.requests_total.inc(outcome=outcome)
+        log.info("Время: %.2f сек, пользователь: %s (@%s), исход: %s", total_time, full_name, username, outcome)
+
+
+async def on_startup(application):
+    """
+    Всё общее состояние живёт столько же, сколько приложение, и создаётся
+    здесь, уже внутри его event loop: HTTP-сессия, курсы валют с фоновым
+    обновлением, очистка кэша, воркеры очереди сканирований и endpoint
+    метрик. Логи настраивает main() до запуска приложения.
+    """
+    await http_client.get_session()
+    rate_provider.load_snapshot()
+    rate_provider.start()
+    await result_cache.cleanup()
+
+    async def deliver(job, result, error):
+        if error is not None and result is None:
+            await application.bot.send_message(
+                chat_id=job.chat_id,
+                text=f"Не удалось получить цены для приложения {job.app_id}: ошибка при сканировании. "
+                     "Попробуйте позже."
+            )
+        elif job.top_k:
+            await send_cheapest(application.bot, job.chat_id, job.store, job.app_id, job.top_k, result)
+        else:
+            await send_result(application.bot, job.chat_id, job.app_id, result)
+
+    scan_queue = ScanJobQueue(
+        lambda job: run_job(application.bot, job, scan_queue.track), deliver, cancel_scans=cancel_scans
+    )
+    application.bot_data["scan_queue"] = scan_queue
+    await scan_queue.start()
+
+    metrics.registry.register(metrics.Gauge(
+        "pricebot_active_scans", "Сканирования в очереди и в работе", lambda: scan_queue.active
+    ))
+    metrics.registry.register(metrics.Gauge(
+        "pricebot_hedges_sent", "Отправлено дублирующих запросов", lambda: hedge_budget.hedges_sent
+    ))
+    application.bot_data["metrics_runner"] = await metrics.start_metrics_server()
+
+
+async def on_stop(application):
+    """
+    Приём сообщений уже остановлен, но бот ещё может отправлять: даём
+    идущим сканированиям закончиться и доставить результат (не дольше
+    job_queue.DRAIN_TIMEOUT). Недоделанные вернутся в очередь при старте.
+    """
+    scan_queue = application.bot_data.get("scan_queue")
+    if scan_queue is not None:
+        await scan_queue.drain()
+
+
+async def on_shutdown(application):
+    """
+    Останавливает воркеров, обновление курсов и endpoint метрик и закрывает
+    общую HTTP-сессию; очередь логов дописывает main() после выхода.
+    """
+    scan_queue = application.bot_data.get("scan_queue")
+    if scan_queue is not None:
+        await scan_queue.stop()
+    await rate_provider.stop()
+    await http_client.close_session()
+    price_history.close()
+    shared_results.close()
+    metrics_runner = application.bot_data.get("metrics_runner")
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+
+
+def new_event_loop():
+    """
+    Event loop для бота: uvloop, если установлен и не выключен USE_UVLOOP.
+    """
+    uvloop = optional_module("uvloop") if USE_UVLOOP else None
+    if uvloop is not None:
+        log.info("Используется uvloop")
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def main():
+    # Логи настраиваются до всего остального, чтобы не потерять сообщения старта
+    log_listener = metrics.setup_logging()
+    application = (
+        ApplicationBuilder()
+        .token(config.CONST_TOKEN)
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("diff", diff_command))
+    application.add_handler(CommandHandler("cheapest", cheapest_command))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+
+    # run_polling сам управляет циклом: запускает его, ловит SIGINT/SIGTERM и
+    # по порядку вызывает post_stop и post_shutdown
+    asyncio.set_event_loop(new_event_loop())
+    try:
+        application.run_polling()
+    except Exception as e:
+        log.exception("Ошибка в основном цикле бота: %s", e)
+    finally:
+        log_listener.stop()
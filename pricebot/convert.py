@@ -0,0 +1,205 @@
+import logging
+import re
+from array import array
+from . import metrics, optional_module
+from .currency_rates import rate_provider
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Табличный парсер цен -----------------
+#
+# Все правила разбора собраны в таблицы спецификаций по валютам. Из каждой
+# спецификации один раз при импорте строится таблица для str.translate,
+# которая за один проход переводит цифры в ASCII, удаляет разделитель тысяч
+# и заменяет десятичный разделитель на точку. После этого число берётся
+# заранее скомпилированным регулярным выражением.
+#
+# Ключи спецификации:
+#   thousands_sep  - разделитель тысяч (удаляется), None - нет
+#   decimal_sep    - десятичный разделитель (заменяется на '.'), None - '.'
+#   digits_map     - замена нелатинских цифр, например арабских
+#   is_already_usd - цена уже в долларах, курс не применяется
+
+arabic_digits_map = {
+    '٠': '0', '١': '1', '٢': '2', '٣': '3',
+    '٤': '4', '٥': '5', '٦': '6', '٧': '7',
+    '٨': '8', '٩': '9'
+}
+
+DEFAULT_SPEC = {"thousands_sep": ",", "decimal_sep": "."}
+
+# Google Play (hl=en): почти везде формат '1,234.56', особые случаи ниже
+GOOGLE_SPECS = {
+    "IDR": {"thousands_sep": ".", "decimal_sep": ","},   # 'Rp 10.000,00'
+    "ZAR": {"thousands_sep": " ", "decimal_sep": ","},   # 'R 1 234,56'
+    "DEFAULT": DEFAULT_SPEC,
+}
+
+# App Store (Sensor Tower API): цены в локальном формате страны
+APPLE_SPECS = {
+    "DZD": {"thousands_sep": None, "decimal_sep": ",", "is_already_usd": True},  # 'US$ 0,99'
+    "BRL": {"thousands_sep": ".", "decimal_sep": ","},
+    "EGP": {"thousands_sep": "٬", "decimal_sep": "٫", "digits_map": arabic_digits_map},
+    "COP": {"thousands_sep": ".", "decimal_sep": ","},
+    "CLP": {"thousands_sep": ".", "decimal_sep": ","},
+    "USD": {"thousands_sep": ",", "decimal_sep": ".", "is_already_usd": True},
+    "DEFAULT": DEFAULT_SPEC,
+}
+
+# Неразрывные пробелы внутри чисел удаляются для всех валют
+_ALWAYS_DELETE = '\xa0 '
+_NUMBER_RE = re.compile(r'[0-9][0-9.]*')
+
+
+class CompiledSpec:
+    __slots__ = ("table", "is_already_usd")
+
+    def __init__(self, spec):
+        table = {ord(ch): None for ch in _ALWAYS_DELETE}
+        for src, dst in (spec.get("digits_map") or {}).items():
+            table[ord(src)] = dst
+        if spec.get("thousands_sep"):
+            table[ord(spec["thousands_sep"])] = None
+        if spec.get("decimal_sep") and spec["decimal_sep"] != '.':
+            table[ord(spec["decimal_sep"])] = '.'
+        self.table = table
+        self.is_already_usd = spec.get("is_already_usd", False)
+
+
+class PriceParser:
+    """
+    Разбирает строки цен одного магазина по таблице спецификаций.
+    usd_markers - подстроки (без учёта регистра), при которых цена считается
+    уже долларовой независимо от валюты страны. name - магазин для метрик.
+    """
+
+    def __init__(self, specs, usd_markers=(), name=""):
+        self.name = name
+        self.specs = {code: CompiledSpec(spec) for code, spec in specs.items()}
+        self.default = self.specs["DEFAULT"]
+        self.usd_spec = CompiledSpec({"thousands_sep": ",", "decimal_sep": ".", "is_already_usd": True})
+        self.usd_re = (
+            re.compile('|'.join(re.escape(m) for m in usd_markers), re.IGNORECASE)
+            if usd_markers else None
+        )
+
+    def spec_for(self, price_str, currency_code):
+        if self.usd_re is not None and self.usd_re.search(price_str):
+            return self.usd_spec
+        return self.specs.get(currency_code, self.default)
+
+    def parse(self, price_str, currency_code, spec=None):
+        """
+        Возвращает число из строки цены ('Rp 10.000' -> 10000.0).
+        Бросает ValueError, если число не найдено или не разбирается.
+        """
+        if spec is None:
+            spec = self.spec_for(price_str, currency_code)
+        match = _NUMBER_RE.search(price_str.translate(spec.table))
+        if match is None:
+            raise ValueError(f"в строке нет числа: {price_str!r}")
+        return float(match.group(0))
+
+    def parse_range(self, price_str, currency_code):
+        """
+        Разбирает '¥100 - ¥200 per item' в (min, max, is_already_usd).
+        Для одиночной цены min=max; из 'x; y' берётся первый диапазон.
+        """
+        first_range = price_str.split(';', 1)[0]
+        spec = self.spec_for(first_range, currency_code)
+        # Один translate на весь диапазон, затем все числа за один проход
+        numbers = _NUMBER_RE.findall(first_range.translate(spec.table))
+        if not numbers:
+            raise ValueError(f"в строке нет числа: {price_str!r}")
+        return float(numbers[0]), float(numbers[-1]), spec.is_already_usd
+
+google_price_parser = PriceParser(GOOGLE_SPECS, name="google")
+apple_price_parser = PriceParser(APPLE_SPECS, usd_markers=("USD", "DZD"), name="apple")
+
+
+# ----------------- Пакетная конвертация -----------------
+
+NUMPY_MIN_BATCH = 64  # Меньше строк - считаем в array('d'): numpy не окупит ни вызовы, ни свой импорт
+
+
+def convert_prices_batch(parser, items, rates):
+    """
+    Конвертирует сразу все цены сканирования в USD.
+    items - последовательность пар (строка_цены, код_валюты), rates - курсы к USD.
+    Строки разбираются за один проход, деление на курс и округление делаются
+    вектором (NumPy, если установлен и строк не меньше NUMPY_MIN_BATCH; numpy
+    импортируется при первой такой пачке). Возвращает два массива
+    (min_usd, max_usd) той же длины, что items; для неразобранных строк там 0.0.
+    """
+    mins = array('d')
+    maxs = array('d')
+    divisors = array('d')  # курс для каждой строки, 0 - строку разобрать не удалось
+    for price_str, currency_code in items:
+        try:
+            low, high, is_already_usd = parser.parse_range(price_str, currency_code)
+        except ValueError:
+            log.warning("Не удалось разобрать цену %s: %r", currency_code, price_str)
+            metrics.price_parse_errors.inc(store=parser.name)
+            low = high = divisor = 0.0
+        else:
+            divisor = 1.0 if is_already_usd else rates.get(currency_code, 1.0)
+        mins.append(low)
+        maxs.append(high)
+        divisors.append(divisor)
+
+    np = optional_module("numpy") if len(divisors) >= NUMPY_MIN_BATCH else None
+    if np is not None:
+        rate_vector = np.frombuffer(divisors, dtype=np.float64)
+        ok = rate_vector > 0
+        safe_rates = np.where(ok, rate_vector, 1.0)
+        result = []
+        for amounts in (mins, maxs):
+            usd = np.maximum(np.round(np.frombuffer(amounts, dtype=np.float64) / safe_rates, 2), 0.01)
+            result.append(np.where(ok, usd, 0.0))
+        return result[0], result[1]
+
+    # Округляем как np.round (x·100 до ближайшего целого, затем /100), а не
+    # round(x, 2): тот округляет точное двоичное значение и на половинах
+    # вроде 716.395 расходится с NumPy - результат зависел бы от размера пачки
+    return tuple(
+        array('d', (max(round(a / r * 100) / 100, 0.01) if r > 0 else 0.0 for a, r in zip(amounts, divisors)))
+        for amounts in (mins, maxs)
+    )
+
+
+# ----------------- Конвертация в USD -----------------
+
+
+def convert_google_country(country_rows):
+    """
+    Цены одной страны в USD: [(currency, price, min_usd, max_usd)]. Нужны по
+    ходу сканирования (ход для пользователя и отсечение стран планом);
+    итоговый CSV всё равно конвертируется одним пакетом.
+    """
+    min_usd, max_usd = convert_prices_batch(
+        google_price_parser, [(price, currency_code) for _, currency_code, price in country_rows], rate_provider.rates
+    )
+    return [
+        (currency_code, price, float(low), float(high))
+        for (_, currency_code, price), low, high in zip(country_rows, min_usd, max_usd)
+    ]
+
+
+def iaps_from_history(rows):
+    """
+    Восстанавливает IAP страны из истории цен, пересчитывая USD по текущему курсу.
+    """
+    min_usd, max_usd = convert_prices_batch(
+        apple_price_parser, [(price_str, currency) for currency, price_str, *_ in rows], rate_provider.rates
+    )
+    return [
+        {
+            "name": name,
+            "price_str": price_str,
+            "currency_code": currency,
+            "duration": duration,
+            "min_price_usd": float(low),
+            "max_price_usd": float(high)
+        }
+        for (currency, price_str, _, _, name, duration), low, high in zip(rows, min_usd, max_usd)
+    ]
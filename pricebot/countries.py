@@ -0,0 +1,23 @@
+# ----------------- Списки стран и валют -----------------
+
+country_currency_dict = {
+    "DZ": "DZD", "AU": "AUD", "BH": "BHD", "BD": "BDT", "BO": "BOB", "BR": "BRL",
+    "KH": "KHR", "CA": "CAD", "KY": "KYD", "CL": "CLP", "CO": "COP", "CR": "CRC",
+    "EG": "EGP", "GE": "GEL", "GH": "GHS", "HK": "HKD", "IN": "INR", "ID": "IDR",
+    "IQ": "IQD", "IL": "ILS", "JP": "JPY", "JO": "JOD", "KZ": "KZT", "KE": "KES",
+    "KR": "KRW", "KW": "KWD", "MO": "MOP", "MY": "MYR", "MX": "MXN", "MA": "MAD",
+    "MM": "MMK", "NZ": "NZD", "NG": "NGN", "OM": "OMR", "PK": "PKR", "PA": "PAB",
+    "PY": "PYG", "PE": "PEN", "PH": "PHP", "QA": "QAR", "RU": "RUB", "SA": "SAR",
+    "RS": "RSD", "SG": "SGD", "ZA": "ZAR", "LK": "LKR", "TW": "TWD", "TZ": "TZS",
+    "TH": "THB", "TR": "TRY", "UA": "UAH", "AE": "AED", "US": "USD", "VN": "VND",
+}
+
+# Список стран, по которым делаем парсинг:
+countries = [
+    "DZ","EG","AU","BD","BO","BR","CA","CL","CO","CR","GE","GH","HK","IN","ID","IQ",
+    "IL","JP","JO","KZ","KE","KR","MO","MY","MX","MA","MM","NZ","NG","PK","PY","PE",
+    "PH","QA","RU","SA","RS","SG","ZA","LK","TW","TZ","TH","TR","UA","AE","US","VN"
+]
+
+# Позиция страны в countries - для стабильной сортировки результатов
+country_index = {country_code: i for i, country_code in enumerate(countries)}
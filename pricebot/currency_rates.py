@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from types import MappingProxyType
+import config
+from . import http_client
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Курсы валют -----------------
+
+RATES_URL = getattr(
+    config, "RATES_URL",
+    "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json"
+)
+RATES_PATH = getattr(config, "RATES_PATH", os.path.join(config.CONST_PATH, "usd_rates.json"))
+RATES_REFRESH_INTERVAL = getattr(config, "RATES_REFRESH_HOURS", 6) * 3600
+RATES_RETRY_INTERVAL = 300  # Пауза после неудачного обновления, сек
+
+# Курс валюты к USD на случай, если нет ни сети, ни сохранённого снимка
+DEFAULT_RATES = {
+    "DZD": 134.966, "AUD": 1.583982, "BHD": 0.376241, "BDT": 109.73,
+    "BOB": 6.909550, "BRL": 5.806974, "CAD": 1.433827, "KYD": 0.833,
+    "CLP": 961.794638, "COP": 4153.599492, "CRC": 504.817577, "EGP": 50.291311,
+    "GEL": 2.867107, "GHS": 15.187930, "HKD": 7.787505, "INR": 86.249922,
+    "IDR": 16149.393463, "IQD": 1309.703222, "ILS": 3.587793, "JPY": 155.855438,
+    "JOD": 0.709118, "KZT": 519.503277, "KES": 129.264801, "KRW": 1432.185253,
+    "KWD": 0.308060, "MOP": 8.021963, "MYR": 4.392292, "MXN": 20.245294,
+    "MAD": 10.007902, "MMK": 2099.980901, "NZD": 1.752597, "NGN": 1550.620034,
+    "OMR": 0.384454, "PKR": 278.655722, "PYG": 7918.619687, "PEN": 3.712514,
+    "PHP": 58.388686, "QAR": 3.639992, "RUB": 97.929483, "SAR": 3.750482,
+    "RSD": 112.125584, "SGD": 1.348339, "ZAR": 18.384263, "LKR": 298.761937,
+    "TWD": 32.687009, "TZS": 2507.601986, "THB": 33.712166, "TRY": 35.678472,
+    "UAH": 41.939132, "AED": 3.671703, "USD": 1,   "VND": 25094.287781
+}
+
+
+def parse_rates(data):
+    """
+    Достаёт курсы из ответа API ({"usd": {"egp": 50.29, ...}}) и приводит коды
+    к верхнему регистру. Нулевые и нечисловые значения пропускаются.
+    """
+    rates = {}
+    for code, value in data.get("usd", {}).items():
+        if isinstance(value, (int, float)) and value > 0:
+            rates[code.upper()] = float(value)
+    if not rates:
+        raise ValueError("в ответе нет курсов")
+    return rates
+
+
+class RateProvider:
+    """
+    Хранит текущий снимок курсов и обновляет его в фоне.
+    Снимок - неизменяемый словарь, который подменяется целиком, поэтому
+    конвертация просто читает rate_provider.rates и никогда не ждёт сеть.
+    Последний удачный ответ сохраняется на диск и читается при старте;
+    если сети нет, работаем на последнем снимке (или на DEFAULT_RATES).
+    """
+
+    def __init__(self, url=RATES_URL, path=RATES_PATH, interval=RATES_REFRESH_INTERVAL,
+                 defaults=DEFAULT_RATES):
+        self.url = url
+        self.path = path
+        self.interval = interval
+        self.defaults = dict(defaults)
+        self.rates = MappingProxyType(self.defaults)
+        self.updated_at = 0.0
+        self._task = None
+
+    def _swap(self, fresh, updated_at):
+        # Валюты, которых нет в ответе, берём из значений по умолчанию
+        merged = dict(self.defaults)
+        merged.update(fresh)
+        self.rates = MappingProxyType(merged)
+        self.updated_at = updated_at
+
+    def load_snapshot(self):
+        """
+        Загружает сохранённый снимок с диска. Вызывается при старте.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._swap(parse_rates(json.load(f)), os.path.getmtime(self.path))
+            log.info("Курсы валют загружены из %s", self.path)
+        except (OSError, ValueError) as e:
+            log.warning("Снимок курсов не загружен (%s), используем значения по умолчанию", e)
+
+    def _save_snapshot(self, body):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, self.path)
+
+    async def refresh(self):
+        """
+        Загружает свежие курсы через общую HTTP-сессию. True при успехе.
+        """
+        try:
+            session = await http_client.get_session()
+            async with session.get(self.url) as response:
+                if response.status != 200:
+                    raise ValueError(f"HTTP {response.status}")
+                body = await response.read()
+            self._swap(parse_rates(json.loads(body)), time.time())
+        except Exception as e:
+            log.warning("Не удалось обновить курсы валют: %s", e)
+            return False
+        try:
+            self._save_snapshot(body)
+        except OSError as e:
+            log.warning("Не удалось сохранить курсы валют: %s", e)
+        log.info("Курсы валют обновлены")
+        return True
+
+    async def _refresh_loop(self):
+        while True:
+            delay = self.interval - (time.time() - self.updated_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not await self.refresh():
+                await asyncio.sleep(RATES_RETRY_INTERVAL)
+
+    def start(self):
+        """
+        Запускает фоновое обновление (нужен работающий event loop).
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rate_provider = RateProvider()
@@ -0,0 +1,497 @@
+import asyncio
+import itertools
+import logging
+import time
+import config
+from . import http_client, metrics
+from .convert import (
+    google_price_parser, apple_price_parser, convert_prices_batch, convert_google_country, iaps_from_history
+)
+from .countries import countries, country_currency_dict, country_index
+from .hedging import hedged, latency_tracker, hedge_budget
+from .output import PriceRow, ResultFile, save_result, GOOGLE_CSV_COLUMNS, APPLE_CSV_COLUMNS
+from .parse import PlayPageScanner, read_country_iaps, CHUNK_SIZE as SCAN_CHUNK_SIZE
+from .currency_rates import rate_provider
+from .price_cache import result_cache, scan_flights
+from .price_history import price_history
+from .scan_planner import scan_planner, country_minimums
+from .scan_progress import ScanProgress, current_progress, priors_from_history
+from .shared_cache import shared_results
+
+log = logging.getLogger("pricebot")
+
+# Сканирование магазинов по странам. Модуль не зависит от Telegram: его
+# импортируют и бот (pricebot.bot), и пакетные задачи (batch_scan.py).
+
+# Адреса страниц магазинов (переопределяются в config, например для тестового сервера)
+GOOGLE_URL = getattr(config, "GOOGLE_URL", 'https://play.google.com/store/apps/details?id={app_id}&hl=en&gl={country_code}')
+APPLE_URL = getattr(config, "APPLE_URL", "https://app.sensortower.com/api/ios/apps/{apple_id}?country={country_code}")
+
+# Сколько стран Google Play запрашиваем одновременно
+GOOGLE_CONCURRENCY = getattr(config, "GOOGLE_CONCURRENCY", 5)
+# Общий срок на одно сканирование с учётом повторов, сек
+SCAN_DEADLINE = getattr(config, "SCAN_DEADLINE", 120)
+# Сколько стран App Store (Sensor Tower) запрашиваем одновременно
+APPLE_CONCURRENCY = getattr(config, "APPLE_CONCURRENCY", 5)
+# Пересканировать только устаревшие страны, остальные брать из истории цен
+INCREMENTAL_RESCAN = getattr(config, "INCREMENTAL_RESCAN", True)
+# Не дочитывать страницу Play, когда цены найдены и ещё EARLY_STOP_WINDOW
+# символов новых цен не дали (или найден маркер 404)
+GOOGLE_EARLY_STOP = getattr(config, "GOOGLE_EARLY_STOP", True)
+EARLY_STOP_WINDOW = getattr(config, "EARLY_STOP_WINDOW", 64 * 1024)
+# Дублировать ли запросы к «застрявшим» странам (см. hedging.py)
+GOOGLE_HEDGING = getattr(config, "GOOGLE_HEDGING", False)
+# Сканировать сначала SCAN_BUDGET стран, которые обычно дешевле остальных, и
+# остановиться, когда оставшиеся уже не могут оказаться дешевле найденного
+# минимума (см. scan_planner.py); None - сканировать все страны
+SCAN_BUDGET = getattr(config, "SCAN_BUDGET", None)
+
+# ----------------- Парсинг Google Play -----------------
+
+
+def record_country(store, started, status):
+    metrics.country_fetch_seconds.observe(time.perf_counter() - started, store=store)
+    metrics.country_status.inc(store=store, status=status)
+
+
+async def get_prices_for_country_google(country_code, app_id, deadline=None):
+    """
+    Вызывается для каждой страны.
+    Загружает страницу Google Play и ищет текст: "XXX per item"
+    Возвращает (все_найденные_цены, currency_code, статус).
+    Запрос идёт через http_client.fetch_with_retry: лимит скорости на хост,
+    повторы при 429/5xx и таймаутах, deadline - общий срок сканирования.
+    """
+    currency_code = country_currency_dict.get(country_code, "USD")
+    url = GOOGLE_URL.format(app_id=app_id, country_code=country_code)
+
+    async def read_page(response):
+        if response.status in http_client.RETRY_STATUSES:
+            log.warning("[Google] %s: HTTP %s после всех попыток", country_code, response.status)
+            return None, currency_code, 'unavailable'
+
+        # Читаем сжатую страницу кусками, распаковываем и ищем маркеры и
+        # "XXX per item" за один проход. Как только ответ ясен (см.
+        # PlayPageScanner.is_settled), остаток не качаем: соединение закрывается.
+        # В этап parse идёт только время распаковки и разбора, без ожидания сети
+        scanner = PlayPageScanner(response.charset or 'utf-8')
+        decompress = http_client.make_decompressor(response.headers.get("Content-Encoding"))
+        parse_time = 0.0
+        wire_bytes = decoded_bytes = 0
+        stopped_early = False
+        async for chunk in response.content.iter_chunked(SCAN_CHUNK_SIZE):
+            started = time.perf_counter()
+            wire_bytes += len(chunk)
+            for piece in (decompress(chunk) if decompress is not None else (chunk,)):
+                decoded_bytes += len(piece)
+                scanner.feed_bytes(piece)
+                if GOOGLE_EARLY_STOP and scanner.is_settled(EARLY_STOP_WINDOW):
+                    stopped_early = True
+                    break
+            parse_time += time.perf_counter() - started
+            if stopped_early:
+                response.close()
+                break
+        scanner.close()
+
+        metrics.stage_seconds.observe(parse_time, store="google", stage="parse")
+        metrics.google_page_bytes.inc(wire_bytes, kind="wire")
+        metrics.google_page_bytes.inc(decoded_bytes, kind="decoded")
+        if stopped_early:
+            metrics.google_early_stops.inc()
+        metrics.add_scan_stats(
+            wire_bytes=wire_bytes, decoded_bytes=decoded_bytes, parse_time=parse_time, early_stops=int(stopped_early)
+        )
+        if not scanner.has_inapp:
+            log.debug("[Google] %s: на странице нет текста 'In-app purchases'", country_code)
+            return None, currency_code, 'noinapp'
+        if scanner.is_404:
+            log.debug("[Google] %s: 404", country_code)
+            return None, currency_code, '404'
+        log.debug("[Google] %s: цен на странице: %d", country_code, len(scanner.prices))
+
+        return scanner.prices, currency_code, True
+
+    try:
+        return await http_client.fetch_with_retry(
+            url, read_page, deadline,
+            headers={"Accept-Encoding": http_client.ACCEPT_ENCODING}, auto_decompress=False
+        )
+    except asyncio.TimeoutError:
+        log.warning("[Google] %s: таймаут запроса", country_code)
+        return None, currency_code, 'timeout'
+    except Exception as e:
+        log.warning("[Google] %s: ошибка запроса: %r", country_code, e)
+        return None, None, False
+
+
+async def fetch_country_google(country_code, app_id, deadline=None):
+    """
+    get_prices_for_country_google с учётом задержек по стране и, если включено
+    GOOGLE_HEDGING, с дублированием запроса, который отвечает дольше обычного.
+    Таймауты и ошибки считаются неудачей: ждём второй запрос.
+    """
+    started = time.perf_counter()
+    result = await hedged(
+        lambda: get_prices_for_country_google(country_code, app_id, deadline),
+        country_code,
+        latency_tracker,
+        hedge_budget if GOOGLE_HEDGING else None,
+        is_ok=lambda result: result[2] in (True, 'noinapp', '404'),
+    )
+    record_country("google", started, 'ok' if result[2] is True else result[2] or 'error')
+    return result
+
+
+async def iter_bounded(func, items, limit):
+    """
+    Запускает func(item) для всех items так, чтобы одновременно в работе было
+    не больше limit вызовов: как только один завершается, стартует следующий.
+    Следующий item берётся из items только перед его запуском, так что
+    итератор (например, ScanPlan) может закончиться раньше, глядя на уже
+    полученные результаты.
+    Отдаёт пары (item, результат) по мере завершения.
+    """
+    items = iter(items)
+    running = set()
+
+    async def run(item):
+        return item, await func(item)
+
+    try:
+        while True:
+            for item in items:
+                running.add(asyncio.create_task(run(item)))
+                if len(running) >= limit:
+                    break
+            if not running:
+                return
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
+
+
+async def plan_scan(store, app_id, to_scan):
+    """
+    ScanPlan для стран to_scan: порядок - по статистике scan_planner, а при
+    SCAN_BUDGET ещё и отсечение стран, которые не могут оказаться дешевле
+    (с учётом прошлых цен этого приложения).
+    """
+    priors = None
+    if SCAN_BUDGET is not None:
+        latest = await asyncio.to_thread(price_history.latest_countries, store, app_id)
+        priors = priors_from_history(latest)
+    return await asyncio.to_thread(scan_planner.plan, store, to_scan, SCAN_BUDGET, priors)
+
+
+def report_skipped(store, app_id, plan):
+    if plan.skipped:
+        metrics.planner_skipped.inc(len(plan.skipped), store=store)
+        log.info("[%s] %s: не сканировали %d стран (%s) - дешевле найденного они, скорее всего, не будут",
+                 store.capitalize(), app_id, len(plan.skipped), ", ".join(plan.skipped))
+
+
+async def fetch_prices_google(app_id, incremental=INCREMENTAL_RESCAN):
+    """
+    Обходит список стран (не больше GOOGLE_CONCURRENCY запросов одновременно),
+    собирает In-App Purchases и сохраняет в CSV. В режиме incremental страны,
+    просканированные недавно (см. price_history.COUNTRY_MAX_AGE), берутся из
+    истории цен, а запрашиваются только устаревшие.
+    """
+    collected_data = []
+    scan_results = {}  # страна -> (статус, индексы её строк в collected_data)
+    deadline = asyncio.get_running_loop().time() + SCAN_DEADLINE
+    stats = {}
+    stats_token = metrics.scan_stats.set(stats)
+    progress = current_progress.get()
+
+    fresh = await asyncio.to_thread(price_history.fresh_countries, "google", app_id) if incremental else {}
+    for country_code, (_, rows) in fresh.items():
+        for currency_code, price, *_ in rows:
+            collected_data.append((country_index[country_code], [country_code, currency_code, price]))
+        if progress is not None:
+            progress.report(country_code, rows)
+    to_scan = [cc for cc in countries if cc not in fresh]
+    if fresh:
+        log.info("[Google] %s: из истории %d стран, сканируем %d", app_id, len(fresh), len(to_scan))
+    plan = await plan_scan("google", app_id, to_scan)
+    for country_code, (_, rows) in fresh.items():
+        plan.record(country_code, rows)
+
+    with metrics.span("fetch", "google"):
+        async for country_code, result in iter_bounded(
+            lambda cc: fetch_country_google(cc, app_id, deadline), plan, GOOGLE_CONCURRENCY
+        ):
+            prices, currency_code, success = result
+            status = 'ok' if success is True else success
+            first_row = len(collected_data)
+
+            if success is True and prices:
+                # Берём все ценовые уровни страны, а не только первый
+                for price in prices:
+                    collected_data.append((country_index[country_code], [country_code, currency_code, price]))
+            elif success not in ('404', 'timeout'):
+                log.debug("[Google] %s: данные не найдены", country_code)
+            scan_results[country_code] = (status, range(first_row, len(collected_data)))
+            if progress is not None or plan.budget is not None:
+                converted = convert_google_country([row for _, row in collected_data[first_row:]])
+                if progress is not None:
+                    progress.report(country_code, converted)
+                plan.record(country_code, converted)
+
+    metrics.scan_stats.reset(stats_token)
+    report_skipped("google", app_id, plan)
+    if stats:
+        log.info("[Google] %s: передано %.0f КБ (распаковано %.0f КБ), распаковка и разбор %.0f мс, "
+                 "дочитано не до конца %d из %d страниц",
+                 app_id, stats['wire_bytes'] / 1024, stats['decoded_bytes'] / 1024, stats['parse_time'] * 1000,
+                 stats['early_stops'], len(scan_results))
+
+    # Конвертируем все найденные цены одним пакетом
+    with metrics.span("convert", "google"):
+        min_usd, max_usd = convert_prices_batch(
+            google_price_parser, [(row[2], row[1]) for _, row in collected_data], rate_provider.rates
+        )
+    rows = [
+        PriceRow("google", app_id, country_code, currency_code, price, float(low), float(high))
+        for (_, [country_code, currency_code, price]), low, high in zip(collected_data, min_usd, max_usd)
+    ]
+
+    await asyncio.to_thread(price_history.record_scan, "google", app_id, {
+        country_code: (status, [(rows[i].currency, rows[i].price_str, rows[i].min_usd, rows[i].max_usd, '', '')
+                                for i in row_range])
+        for country_code, (status, row_range) in scan_results.items()
+    })
+    # Базовая (самая дешёвая) страна - по всему результату, а учимся только
+    # на странах, реально запрошенных в этом сканировании
+    await asyncio.to_thread(scan_planner.learn, "google", country_minimums(rows), scan_results)
+
+    # Неполный результат (страны не ответили или отсечены планом) не кэшируется:
+    # иначе его бы отдавали весь срок кэша, хотя стран в нём не хватает.
+    # Повторное сканирование дёшево - готовые страны берутся из истории цен
+    complete = not plan.skipped and all(status in ('ok', 'noinapp', '404') for status, _ in scan_results.values())
+    return await save_result("google", app_id, rows, GOOGLE_CSV_COLUMNS, complete)
+
+
+# ----------------- Парсинг App Store через JSON (Sensor Tower API) -----------------
+
+
+async def get_prices_for_country_apple(country_code, apple_id, deadline=None):
+    """
+    Запрашивает JSON-данные с Sensor Tower API.
+    Запрос идёт через http_client.fetch_with_retry (лимит скорости, повторы,
+    общий срок сканирования deadline).
+    """
+    url = APPLE_URL.format(apple_id=apple_id, country_code=country_code)
+    currency_code = country_currency_dict.get(country_code, "USD")
+
+    async def read_json(response):
+        # Пустой список - страна просканирована, покупок нет; None - ошибка
+        if response.status == 404:
+            log.debug("[Apple] %s: 404 для %s", country_code, url)
+            return []
+        if response.status in http_client.RETRY_STATUSES:
+            log.warning("[Apple] %s: HTTP %s после всех попыток", country_code, response.status)
+            return None
+        if response.status != 200:
+            # Тело ошибки - не ответ API, разбирать его как JSON нечего
+            log.warning("[Apple] %s: HTTP %s для %s", country_code, response.status, url)
+            return None
+
+        iaps_for_country = await read_country_iaps(response, country_code)
+        if not iaps_for_country:
+            log.debug("[Apple] %s: нет IAP для страны", country_code)
+            return []
+
+        with metrics.span("convert", "apple"):
+            min_usd, max_usd = convert_prices_batch(
+                apple_price_parser,
+                [(iap.get("price", ""), currency_code) for iap in iaps_for_country],
+                rate_provider.rates
+            )
+
+        results = []
+        for iap, min_price_usd, max_price_usd in zip(iaps_for_country, min_usd, max_usd):
+            results.append({
+                "name": iap.get("name", ""),
+                "price_str": iap.get("price", ""),
+                "currency_code": currency_code,
+                "duration": iap.get("duration", ""),
+                "min_price_usd": float(min_price_usd),
+                "max_price_usd": float(max_price_usd)
+            })
+        return results
+
+    started = time.perf_counter()
+    status = 'error'
+    try:
+        result = await http_client.fetch_with_retry(url, read_json, deadline)
+        status = 'ok' if result else 'noinapp' if result is not None else 'unavailable'
+        return result
+    except asyncio.TimeoutError:
+        status = 'timeout'
+        log.warning("[Apple] %s: таймаут запроса для %s", country_code, url)
+        return None
+    except Exception as e:
+        log.warning("[Apple] %s: ошибка запроса: %r", country_code, e)
+        return None
+    finally:
+        record_country("apple", started, status)
+
+
+async def fetch_prices_apple(apple_id, incremental=INCREMENTAL_RESCAN):
+    """
+    Обходит все страны из countries (не больше APPLE_CONCURRENCY запросов
+    одновременно), собирает IAP из JSON Sensor Tower и пишет их в один CSV.
+    В режиме incremental недавно просканированные страны берутся из истории цен.
+    """
+    collected_data = []
+    scan_results = {}
+    failed = []  # страны без ответа: таймаут или ошибка
+    deadline = asyncio.get_running_loop().time() + SCAN_DEADLINE
+    progress = current_progress.get()
+
+    fresh = await asyncio.to_thread(price_history.fresh_countries, "apple", apple_id) if incremental else {}
+    to_scan = [cc for cc in countries if cc not in fresh]
+    if fresh:
+        log.info("[Apple] %s: из истории %d стран, сканируем %d", apple_id, len(fresh), len(to_scan))
+    plan = await plan_scan("apple", apple_id, to_scan)
+    for country_code, (_, rows) in fresh.items():
+        plan.record(country_code, rows)
+
+    async def scan_country(country_code):
+        if country_code in fresh:
+            return iaps_from_history(fresh[country_code][1])
+        iaps_list = await get_prices_for_country_apple(country_code, apple_id, deadline)
+        if iaps_list is not None:
+            scan_results[country_code] = ('ok' if iaps_list else 'noinapp', [
+                (iap["currency_code"], iap["price_str"], iap["min_price_usd"],
+                 iap["max_price_usd"], iap["name"], iap["duration"])
+                for iap in iaps_list
+            ])
+        else:
+            failed.append(country_code)
+        return iaps_list
+
+    with metrics.span("fetch", "apple"):
+        # Страны из истории отдаются сразу, остальные - в порядке плана
+        async for country_code, iaps_list in iter_bounded(
+            scan_country, itertools.chain(fresh, plan), APPLE_CONCURRENCY
+        ):
+            price_rows = [
+                (iap["currency_code"], iap["price_str"], iap["min_price_usd"]) for iap in iaps_list or ()
+            ]
+            plan.record(country_code, price_rows)
+            if progress is not None:
+                progress.report(country_code, price_rows)
+            if not iaps_list:
+                continue
+
+            for iap in iaps_list:
+                collected_data.append(PriceRow(
+                    "apple", apple_id, country_code, iap["currency_code"], iap["price_str"],
+                    iap["min_price_usd"], iap["max_price_usd"], iap["name"], iap["duration"]
+                ))
+            log.debug("[Apple] %s: IAP: %d", country_code, len(iaps_list))
+
+    report_skipped("apple", apple_id, plan)
+    await asyncio.to_thread(price_history.record_scan, "apple", apple_id, scan_results)
+    await asyncio.to_thread(scan_planner.learn, "apple", country_minimums(collected_data), scan_results)
+
+    return await save_result("apple", apple_id, collected_data, APPLE_CSV_COLUMNS, not failed and not plan.skipped)
+
+
+# ----------------- Сканирование с ходом и кэшем -----------------
+
+STORE_SCANNERS = {"google": fetch_prices_google, "apple": fetch_prices_apple}
+
+active_progress = {}  # (store, app_id) -> ScanProgress идущего сканирования
+
+
+async def scan_with_progress(store, app_id, progress):
+    """
+    Сканирование, которое сообщает о каждой готовой стране в progress.
+    Если это приложение уже сканирует другой процесс бота, ждёт его
+    результат (см. shared_cache.py), а ход берёт из истории цен.
+    """
+    token = current_progress.set(progress)
+    try:
+        filepath = await shared_results.claim(store, app_id)
+        if filepath is not None:
+            latest = await asyncio.to_thread(price_history.latest_countries, store, app_id)
+            for country_code, (_, _, rows) in latest.items():
+                progress.report(country_code, rows)
+            return ResultFile.from_path(filepath)
+        try:
+            return await STORE_SCANNERS[store](app_id)
+        finally:
+            await shared_results.release(store, app_id)
+    finally:
+        current_progress.reset(token)
+        active_progress.pop((store, app_id), None)
+        progress.finish()
+
+
+async def cancel_scans():
+    """
+    Отменяет идущие сканирования и продление их аренд и ждёт, пока они
+    завершатся. Вызывается очередью задач при остановке, до того как
+    закроются HTTP-сессия и базы.
+    """
+    await scan_flights.cancel_all()
+    await shared_results.stop()
+
+
+async def cached_progress(store, app_id):
+    latest = await asyncio.to_thread(price_history.latest_countries, store, app_id)
+    return ScanProgress.from_history(countries, latest)
+
+
+async def run_scan(store, app_id, listener=None, top_k=None, track=None):
+    """
+    Выполняет сканирование для очереди задач. Свежий результат берётся из кэша,
+    одинаковые одновременные сканирования объединяются. listener(progress)
+    вызывается по ходу сканирования.
+    С top_k ответ - ScanProgress, и он возвращается, как только top_k самых
+    дешёвых стран устоялись (ScanProgress.is_settled); сканирование при этом
+    доходит до конца без ожидания и попадает в кэш и историю цен. Его задача
+    передаётся в track(task), чтобы очередь учитывала её в лимитах и
+    дожидалась при остановке.
+    Иначе ответ - ResultFile с полным результатом.
+    """
+    filepath = await result_cache.get(store, app_id)
+    if filepath:
+        return await cached_progress(store, app_id) if top_k else ResultFile.from_path(filepath)
+
+    key = (store, app_id)
+    progress = active_progress.get(key)
+    if progress is None:
+        latest = await asyncio.to_thread(price_history.latest_countries, store, app_id)
+        # Пока читали историю, это же сканирование мог запустить другой воркер
+        progress = active_progress.setdefault(key, ScanProgress(countries, priors_from_history(latest)))
+    flight = scan_flights.start(key, lambda: scan_with_progress(store, app_id, progress))
+
+    settled = asyncio.get_running_loop().create_future()
+
+    def on_progress(progress):
+        if listener is not None:
+            listener(progress)
+        if top_k and not settled.done() and progress.is_settled(top_k):
+            settled.set_result(progress)
+
+    progress.subscribe(on_progress)
+    try:
+        with metrics.span("scan", store):
+            await asyncio.wait([flight, settled], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        progress.unsubscribe(on_progress)
+        settled.cancel()
+    if not flight.done():
+        if track is not None:
+            track(flight)
+        return progress
+    result = flight.result()
+    return progress if top_k else result
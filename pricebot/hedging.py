@@ -0,0 +1,142 @@
+import asyncio
+import bisect
+import logging
+import time
+import config
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Хеджирование медленных запросов -----------------
+
+HEDGE_QUANTILE = getattr(config, "HEDGE_QUANTILE", 0.95)   # После какого перцентиля шлём дубль
+HEDGE_BUDGET = getattr(config, "HEDGE_BUDGET", 0.05)       # Доля дублей от всех запросов
+HEDGE_MIN_SAMPLES = 20    # Меньше замеров - гистограмме не доверяем, дубли не шлём
+HISTOGRAM_DECAY_AT = 500  # При стольких замерах счётчики делятся пополам
+
+# Границы корзин гистограммы задержек, сек
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 10.0, float('inf'))
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек с фиксированными корзинами. Когда замеров
+    набирается много, счётчики делятся пополам, чтобы свежие данные весили
+    больше старых.
+    """
+
+    def __init__(self):
+        self.counts = [0.0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += 1
+        if self.total >= HISTOGRAM_DECAY_AT:
+            self.counts = [c / 2 for c in self.counts]
+            self.total /= 2
+
+    def quantile(self, q):
+        """
+        Верхняя граница корзины, в которую попадает перцентиль q.
+        """
+        threshold = q * self.total
+        seen = 0.0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= threshold:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+
+class LatencyTracker:
+    """
+    Гистограммы задержек по странам плюс общая. Пока по стране мало
+    замеров, используется общая гистограмма.
+    """
+
+    def __init__(self):
+        self.by_country = {}
+        self.overall = LatencyHistogram()
+
+    def record(self, country_code, seconds):
+        histogram = self.by_country.get(country_code)
+        if histogram is None:
+            histogram = self.by_country[country_code] = LatencyHistogram()
+        histogram.record(seconds)
+        self.overall.record(seconds)
+
+    def hedge_delay(self, country_code, q=HEDGE_QUANTILE):
+        """
+        Через сколько секунд без ответа слать дубль, либо None, если данных мало.
+        """
+        histogram = self.by_country.get(country_code)
+        if histogram is None or histogram.total < HEDGE_MIN_SAMPLES:
+            histogram = self.overall
+        if histogram.total < HEDGE_MIN_SAMPLES:
+            return None
+        delay = histogram.quantile(q)
+        return None if delay == float('inf') else delay
+
+
+class HedgeBudget:
+    """
+    Каждый обычный запрос добавляет ratio токена, каждый дубль тратит один.
+    Так дубли не превышают ratio от общего числа запросов.
+    """
+
+    def __init__(self, ratio=HEDGE_BUDGET, burst=5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self.hedges_sent = 0
+
+    def on_request(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self):
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        self.hedges_sent += 1
+        return True
+
+
+async def hedged(make_request, country_code, tracker, budget, is_ok=lambda result: True):
+    """
+    Выполняет make_request(); если ответа нет дольше перцентиля задержек
+    страны и бюджет позволяет, запускает дубль и возвращает тот результат,
+    который придёт первым (неудачный ответ одного ждёт ответа другого).
+    Проигравший запрос отменяется. При budget=None дубли не шлются,
+    только пополняется гистограмма задержек.
+    """
+    started = time.monotonic()
+    primary = asyncio.ensure_future(make_request())
+    delay = None
+    if budget is not None:
+        budget.on_request()
+        delay = tracker.hedge_delay(country_code)
+
+    pending = {primary}
+    result = None
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and budget.try_spend():
+                log.info("[Hedge] %s: нет ответа за %.2f с, отправляем дубль", country_code, delay)
+                pending.add(asyncio.ensure_future(make_request()))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if is_ok(result):
+                    return result
+        return result
+    finally:
+        for task in pending:
+            task.cancel()
+        tracker.record(country_code, time.monotonic() - started)
+
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import random
+import time
+import zlib
+from urllib.parse import urlsplit
+import config
+from . import metrics
+try:
+    import brotli  # необязателен: без него br не запрашиваем
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Общая HTTP-сессия -----------------
+
+# Одна долгоживущая сессия на всё приложение: соединения с play.google.com
+# и app.sensortower.com переиспользуются между странами и запросами,
+# поэтому TCP+TLS рукопожатие делается один раз, а не на каждую страну.
+CONNECTION_LIMIT = getattr(config, "HTTP_CONNECTION_LIMIT", 100)
+CONNECTION_LIMIT_PER_HOST = getattr(config, "HTTP_CONNECTION_LIMIT_PER_HOST", 20)
+KEEPALIVE_TIMEOUT = getattr(config, "HTTP_KEEPALIVE_TIMEOUT", 60)
+DNS_CACHE_TTL = getattr(config, "HTTP_DNS_CACHE_TTL", 300)
+REQUEST_TIMEOUT = 10  # Таймаут одного запроса в секундах
+
+_session = None
+_session_lock = asyncio.Lock()
+
+
+def create_session():
+    """
+    Создаёт сессию с настроенным коннектором:
+    лимит соединений на хост, keep-alive и кэш DNS.
+    aiohttp импортируется здесь, а не при импорте модуля: его загрузка
+    заметна на старте коротких процессов, которым сеть может не понадобиться.
+    """
+    import aiohttp
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        use_dns_cache=True,
+    )
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def get_session():
+    """
+    Возвращает общую сессию, создавая её при первом обращении
+    (сессия должна создаваться внутри работающего event loop).
+    """
+    global _session
+    if _session is None or _session.closed:
+        async with _session_lock:
+            if _session is None or _session.closed:
+                _session = create_session()
+    return _session
+
+
+async def close_session():
+    """
+    Закрывает общую сессию. Вызывается при остановке бота.
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+# ----------------- Сжатие ответов -----------------
+
+# Для запросов с auto_decompress=False: тело распаковывается вызывающим
+# по кускам, так что можно считать байты по сети и остановиться на середине
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+DECOMPRESS_PIECE = 16 * 1024  # Больше этого за раз не распаковываем
+
+
+def make_decompressor(content_encoding):
+    """
+    Функция chunk -> генератор распакованных кусков для заголовка
+    Content-Encoding, либо None, если тело не сжато. gzip/deflate отдаются
+    кусками не больше DECOMPRESS_PIECE, чтобы читатель мог остановиться,
+    не распаковывая остаток уже полученного блока.
+    """
+    encoding = (content_encoding or "").strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding != "deflate" else zlib.MAX_WBITS)
+
+        def pieces(chunk):
+            while chunk:
+                piece = decompressor.decompress(chunk, DECOMPRESS_PIECE)
+                chunk = decompressor.unconsumed_tail
+                if piece:
+                    yield piece
+        return pieces
+    if encoding == "br" and brotli is not None:
+        decompressor = brotli.Decompressor()
+        process = getattr(decompressor, "process", None) or decompressor.decompress
+
+        def pieces(chunk):
+            piece = process(chunk)
+            if piece:
+                yield piece
+        return pieces
+    raise ValueError(f"Неподдерживаемый Content-Encoding: {content_encoding}")
+
+
+# ----------------- Ограничение скорости и повторы -----------------
+
+# Запросов в секунду на хост; для остальных хостов - DEFAULT_HOST_RATE
+HOST_RATE_LIMITS = getattr(config, "HOST_RATE_LIMITS", {
+    "play.google.com": 10.0,
+    "app.sensortower.com": 5.0,
+})
+DEFAULT_HOST_RATE = 10.0
+MAX_RETRIES = getattr(config, "HTTP_MAX_RETRIES", 3)  # Всего попыток на запрос
+BACKOFF_BASE = 1.5                                    # Как backoffFactor в main.go
+BACKOFF_MAX = 15.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Ограничитель скорости «ведро с токенами»: rate токенов в секунду,
+    не больше capacity про запас. Асинхронный аналог RateLimiter из main.go.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1.0:
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1.0
+
+
+_host_limiters = {}
+
+
+def get_host_limiter(host):
+    limiter = _host_limiters.get(host)
+    if limiter is None:
+        limiter = _host_limiters[host] = TokenBucket(HOST_RATE_LIMITS.get(host, DEFAULT_HOST_RATE))
+    return limiter
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Пауза перед попыткой attempt+1: экспоненциальная с «полным» джиттером,
+    либо Retry-After от сервера, если он прислан.
+    """
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def fetch_with_retry(url, process, deadline=None, retries=MAX_RETRIES, **request_kwargs):
+    """
+    GET-запрос через общую сессию с ограничением скорости по хосту и повторами
+    при 429/5xx, таймаутах и сетевых ошибках. process(response) - корутина,
+    которая читает ответ; её результат возвращается. deadline - момент
+    (по loop.time()), после которого новых попыток не делаем: общий срок на
+    всё сканирование. На последней попытке ответ с любым статусом отдаётся в
+    process, а исключение пробрасывается наверх, как при одном запросе.
+    request_kwargs (headers, auto_decompress и т.п.) передаются в session.get.
+    """
+    import aiohttp
+    loop = asyncio.get_running_loop()
+    limiter_host = urlsplit(url).hostname
+    limiter = get_host_limiter(limiter_host)
+    session = await get_session()
+
+    for attempt in range(retries):
+        remaining = REQUEST_TIMEOUT if deadline is None else deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        last_attempt = attempt == retries - 1
+        await limiter.acquire()
+        retry_after = None
+        try:
+            timeout = aiohttp.ClientTimeout(total=min(REQUEST_TIMEOUT, remaining))
+            async with session.get(url, timeout=timeout, **request_kwargs) as response:
+                if response.status not in RETRY_STATUSES or last_attempt:
+                    return await process(response)
+                retry_after = _retry_after(response)
+                metrics.http_retries.inc(host=limiter_host, reason=str(response.status))
+                log.info("Попытка %d из %d: HTTP-статус %s для %s", attempt + 1, retries, response.status, url)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            if last_attempt:
+                raise
+            metrics.http_retries.inc(
+                host=limiter_host, reason='timeout' if isinstance(e, asyncio.TimeoutError) else 'error'
+            )
+            log.info("Попытка %d из %d: ошибка запроса %s: %r", attempt + 1, retries, url, e)
+
+        delay = backoff_delay(attempt, retry_after)
+        if deadline is not None:
+            delay = min(delay, max(deadline - loop.time(), 0))
+        await asyncio.sleep(delay)
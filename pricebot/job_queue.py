@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import config
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Очередь сканирований -----------------
+
+# Экземпляры бота делят CONST_PATH ради общих результатов, но очередь у каждого
+# своя: при старте экземпляр возвращает в очередь все running-задачи базы,
+# а задачи отвечают через своего бота. По умолчанию экземпляр - это бот (id из токена)
+INSTANCE_ID = getattr(config, "INSTANCE_ID", str(config.CONST_TOKEN).split(":", 1)[0])
+JOBS_DB_PATH = getattr(config, "JOBS_DB_PATH", os.path.join(config.CONST_PATH, f"jobs-{INSTANCE_ID}.sqlite3"))
+_LEGACY_JOBS_DB_PATH = os.path.join(config.CONST_PATH, "jobs.sqlite3")  # общая база до INSTANCE_ID
+SCAN_WORKERS = getattr(config, "SCAN_WORKERS", 2)  # Сколько сканирований идёт одновременно
+DRAIN_TIMEOUT = getattr(config, "SHUTDOWN_DRAIN_TIMEOUT", 150)  # Сколько ждать идущие сканирования при остановке, сек
+JOBS_RETENTION = getattr(config, "JOBS_RETENTION", 7 * 24 * 3600)  # Сколько хранить завершённые задачи, сек
+PRUNE_INTERVAL = 3600  # Как часто удалять старые задачи, сек
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     INTEGER NOT NULL,
+    chat_id     INTEGER NOT NULL,
+    store       TEXT    NOT NULL,
+    app_id      TEXT    NOT NULL,
+    status      TEXT    NOT NULL DEFAULT 'pending',  -- held / pending / running / done / failed
+    created_at  REAL    NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    result_path TEXT,
+    error       TEXT,
+    top_k       INTEGER,  -- NULL - полный результат, иначе только k самых дешёвых стран
+    message_id  INTEGER   -- сообщение статуса, которое правится по ходу сканирования
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, user_id, id);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, finished_at);
+-- Когда пользователя обслуживали в последний раз: одна строка на пользователя,
+-- чтобы справедливый порядок не перебирал всю историю задач
+CREATE TABLE IF NOT EXISTS served (
+    user_id     INTEGER PRIMARY KEY,
+    last_served REAL    NOT NULL
+);
+DROP INDEX IF EXISTS jobs_served;
+"""
+
+# Колонки, добавленные после первой версии схемы: в старые базы дописываются при открытии
+_ADDED_COLUMNS = (("top_k", "INTEGER"), ("message_id", "INTEGER"))
+
+# Справедливый порядок: сначала первые задачи каждого пользователя, потом вторые
+# и т.д.; среди равных раньше идёт тот, кого дольше не обслуживали.
+# Так один пользователь с десятком ссылок не задерживает остальных.
+# Перебираются только pending-задачи и таблица served, а не вся история;
+# параметр - id задачи, которую нужно учесть, даже если она ещё held.
+_FAIR_ORDER = """
+SELECT id FROM (
+    SELECT j.id, s.last_served,
+           ROW_NUMBER() OVER (PARTITION BY j.user_id ORDER BY j.id) AS turn
+    FROM jobs j LEFT JOIN served s ON s.user_id = j.user_id
+    WHERE j.status = 'pending' OR j.id = ?
+) ORDER BY turn, last_served, id
+"""
+
+
+class ScanJob:
+    __slots__ = ("id", "user_id", "chat_id", "store", "app_id", "top_k", "message_id")
+
+    def __init__(self, id, user_id, chat_id, store, app_id, top_k=None, message_id=None):
+        self.id = id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.store = store
+        self.app_id = app_id
+        self.top_k = top_k
+        self.message_id = message_id
+
+
+class ScanJobQueue:
+    """
+    Очередь сканирований в SQLite с пулом асинхронных воркеров.
+    run_scan(job) -> результат (с атрибутом path - путь к файлу или None)
+    выполняет сканирование, deliver(job, result, error) отправляет
+    результат пользователю. cancel_scans() - корутина, которая отменяет
+    сканирования, не доделанные к концу drain (их задачи живут отдельно
+    от воркеров, см. price_cache.SingleFlight).
+    Задачи, которые выполнялись в момент падения, при старте
+    возвращаются в очередь.
+    """
+
+    def __init__(self, run_scan, deliver, path=JOBS_DB_PATH, workers=SCAN_WORKERS, cancel_scans=None):
+        self.run_scan = run_scan
+        self.deliver = deliver
+        self.cancel_scans = cancel_scans
+        self.workers = workers
+        if path == JOBS_DB_PATH and not hasattr(config, "JOBS_DB_PATH") and not os.path.exists(path):
+            # Очередь из общей базы прошлых версий забирает себе первый запущенный экземпляр
+            try:
+                os.replace(_LEGACY_JOBS_DB_PATH, path)
+            except FileNotFoundError:
+                pass
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.executescript(_SCHEMA)
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for name, column_type in _ADDED_COLUMNS:
+            if name not in existing:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+        # Базы до появления served: переносим в неё время последнего обслуживания
+        self._db.execute(
+            "INSERT OR IGNORE INTO served (user_id, last_served) "
+            "SELECT user_id, MAX(started_at) FROM jobs WHERE started_at IS NOT NULL GROUP BY user_id"
+        )
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._detached = set()  # сканирования, ответ по которым уже отдан (см. track)
+        self._stopping = False
+        # Задач в очереди и в работе; держим в памяти, чтобы не ходить в базу на каждый запрос
+        self.active = self.pending_count()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _enqueue(self, user_id, chat_id, store, app_id, top_k, message_id, status='pending'):
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (user_id, chat_id, store, app_id, created_at, top_k, message_id, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, chat_id, store, app_id, time.time(), top_k, message_id, status)
+            )
+            job_id = cursor.lastrowid
+        return job_id, self._position(job_id)
+
+    def _position(self, job_id):
+        with self._lock:
+            for position, (pending_id,) in enumerate(self._db.execute(_FAIR_ORDER, (job_id,)), start=1):
+                if pending_id == job_id:
+                    return position
+        return 0
+
+    def _claim_next(self):
+        with self._lock:
+            # Выбор и захват задачи - одна транзакция с блокировкой записи:
+            # задачу не возьмут дважды, даже если базу по ошибке открыл
+            # ещё один процесс
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(_FAIR_ORDER + " LIMIT 1", (0,)).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                now = time.time()
+                self._db.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'pending'",
+                    (now, row[0])
+                )
+                job = self._db.execute(
+                    "SELECT id, user_id, chat_id, store, app_id, top_k, message_id FROM jobs WHERE id = ?", (row[0],)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO served (user_id, last_served) VALUES (?, ?)", (job[1], now)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return ScanJob(*job)
+
+    def _finish(self, job_id, result, error):
+        filepath = getattr(result, "path", None)
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result_path = ?, error = ? WHERE id = ?",
+            ('failed' if error else 'done', now, filepath, error, job_id)
+        )
+        if now - self._pruned_at >= PRUNE_INTERVAL:
+            self._prune(now)
+
+    def _prune(self, now):
+        """
+        Удаляет завершённые задачи старше JOBS_RETENTION и давно не
+        обслуженных пользователей: без этого таблицы растут с каждым
+        сообщением. Пользователь без строки в served считается обслуженным
+        раньше всех, так что порядок для него не меняется.
+        """
+        self._pruned_at = now
+        cutoff = now - JOBS_RETENTION
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+            )
+            self._db.execute("DELETE FROM served WHERE last_served < ?", (cutoff,))
+
+    def _resume_interrupted(self):
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = 'pending', started_at = NULL WHERE status IN ('held', 'running')"
+            ).rowcount
+
+    def _release_held(self, job_id):
+        self._execute("UPDATE jobs SET status = 'pending' WHERE id = ? AND status = 'held'", (job_id,))
+
+    async def enqueue(self, user_id, chat_id, store, app_id, top_k=None, message_id=None, on_queued=None):
+        """
+        Ставит сканирование в очередь. Возвращает (id задачи, позиция в очереди).
+        on_queued(position) - корутина, которая выполняется до того, как задачу
+        смогут взять воркеры: задача до тех пор в статусе held. Так сообщение
+        о месте в очереди не затрёт ход сканирования, который воркер пишет
+        в то же сообщение.
+        """
+        job_id, position = await asyncio.to_thread(
+            self._enqueue, user_id, chat_id, store, app_id, top_k, message_id,
+            'pending' if on_queued is None else 'held'
+        )
+        # Считаем задачу только после вставки: если база не ответила,
+        # в active не должна остаться задача, которой нет
+        self.active += 1
+        if on_queued is not None:
+            try:
+                await on_queued(position)
+            finally:
+                await asyncio.to_thread(self._release_held, job_id)
+        self._wakeup.set()
+        return job_id, position
+
+    def track(self, task):
+        """
+        Учитывает работу, которая продолжается после того, как задача уже
+        завершена (например, сканирование после раннего ответа /cheapest):
+        пока она идёт, она входит в active, а drain её дожидается.
+        """
+        self.active += 1
+        self._detached.add(task)
+        task.add_done_callback(self._untrack)
+
+    def _untrack(self, task):
+        self._detached.discard(task)
+        self.active -= 1
+
+    def pending_count(self):
+        return self._execute("SELECT COUNT(*) FROM jobs WHERE status IN ('held', 'pending', 'running')")[0][0]
+
+    async def _worker(self, number):
+        while not self._stopping:
+            # Сбрасываем флаг до выборки, чтобы не пропустить задачу, добавленную во время неё
+            self._wakeup.clear()
+            job = await asyncio.to_thread(self._claim_next)
+            if job is None:
+                await self._wakeup.wait()
+                continue
+
+            log.info("[Queue] Воркер %d: задача %d (%s:%s)", number, job.id, job.store, job.app_id)
+            result, error = None, None
+            try:
+                result = await self.run_scan(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = repr(e)
+                log.error("[Queue] Задача %d завершилась ошибкой: %s", job.id, error)
+
+            try:
+                await self.deliver(job, result, error)
+            except Exception as e:
+                log.error("[Queue] Не удалось доставить результат задачи %d: %s", job.id, e)
+            await asyncio.to_thread(self._finish, job.id, result, error)
+            self.active -= 1
+
+    async def start(self):
+        """
+        Возвращает в очередь задачи, прерванные прошлым падением, и запускает воркеров.
+        """
+        await asyncio.to_thread(self._prune, time.time())
+        resumed = await asyncio.to_thread(self._resume_interrupted)
+        if resumed:
+            log.info("[Queue] Возобновлено задач после перезапуска: %d", resumed)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._wakeup.set()
+
+    async def drain(self, timeout=DRAIN_TIMEOUT):
+        """
+        Перестаёт брать новые задачи и ждёт, пока воркеры доделают и доставят
+        текущие, а сканирования из track закончатся, не дольше timeout секунд.
+        Недоделанные задачи отменяются и остаются в базе в статусе running -
+        при следующем старте они вернутся в очередь. Оставшиеся pending-задачи
+        тоже дождутся следующего старта. Отмена воркера прерывает только его
+        ожидание, поэтому сами сканирования отменяются через cancel_scans.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        waiting = self._tasks + list(self._detached)
+        if waiting:
+            _, pending = await asyncio.wait(waiting, timeout=timeout)
+            if pending:
+                log.warning("[Queue] Не дождались завершения сканирований: %d, отменяем", len(pending))
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            self._tasks = []
+        if self.cancel_scans is not None:
+            await self.cancel_scans()
+
+    async def stop(self):
+        await self.drain(timeout=0)
+        self._db.close()
@@ -0,0 +1,233 @@
+import bisect
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from contextlib import contextmanager
+import config
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Метрики -----------------
+
+METRICS_HOST = getattr(config, "METRICS_HOST", "127.0.0.1")
+METRICS_PORT = getattr(config, "METRICS_PORT", 9108)  # None - не поднимать endpoint
+LOGS_PATH = getattr(config, "LOGS_PATH", os.path.join(config.CONST_PATH, "logs.log"))
+LOG_LEVEL = getattr(config, "LOG_LEVEL", "INFO")  # DEBUG - ещё и по строке на каждую страну
+
+# Границы корзин гистограмм длительности, сек
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """
+    Монотонный счётчик с метками: counter.inc(store="google", status="404").
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами, в формате Prometheus
+    (накопительные _bucket, _sum и _count для каждого набора меток).
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # метки -> [счётчики корзин..., +Inf, сумма]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Значение, которое читается в момент выгрузки: func() -> число.
+    """
+
+    def __init__(self, name, documentation, func):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.func()}"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "pricebot_stage_seconds", "Длительность этапов сканирования", ("store", "stage")
+))
+country_fetch_seconds = registry.register(Histogram(
+    "pricebot_country_fetch_seconds", "Время получения и разбора одной страны с учётом повторов", ("store",)
+))
+country_status = registry.register(Counter(
+    "pricebot_country_status_total", "Итоги сканирования стран по статусам", ("store", "status")
+))
+price_parse_errors = registry.register(Counter(
+    "pricebot_price_parse_errors_total", "Строки цен, которые не удалось разобрать", ("store",)
+))
+google_page_bytes = registry.register(Counter(
+    "pricebot_google_page_bytes_total", "Байты страниц Google Play: wire - по сети, decoded - после распаковки", ("kind",)
+))
+google_early_stops = registry.register(Counter(
+    "pricebot_google_early_stops_total", "Страницы Google Play, дочитанные не до конца", ()
+))
+planner_skipped = registry.register(Counter(
+    "pricebot_planner_skipped_countries_total", "Страны, не сканированные из-за отсечения планом", ("store",)
+))
+shared_flights = registry.register(Counter(
+    "pricebot_shared_flights_total", "Сканирования под общей арендой: owner - сканировали сами, "
+    "follower - дождались результата другого процесса", ("role",)
+))
+http_retries = registry.register(Counter(
+    "pricebot_http_retries_total", "Повторы HTTP-запросов", ("host", "reason")
+))
+requests_total = registry.register(Counter(
+    "pricebot_requests_total", "Сообщения пользователей по результату обработки", ("outcome",)
+))
+
+
+@contextmanager
+def span(stage, store=""):
+    """
+    Замеряет длительность блока и пишет её в pricebot_stage_seconds:
+        with metrics.span("convert", "google"):
+            ...
+    Работает и внутри корутин: учитывается всё время блока, включая ожидания.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, store=store, stage=stage)
+
+
+# Счётчики текущего сканирования: словарь кладётся в контекст в начале скана,
+# задачи стран наследуют контекст и добавляют в тот же словарь
+scan_stats = contextvars.ContextVar("scan_stats", default=None)
+
+
+def add_scan_stats(**values):
+    stats = scan_stats.get()
+    if stats is not None:
+        for name, value in values.items():
+            stats[name] = stats.get(name, 0) + value
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Поднимает endpoint /metrics в текстовом формате Prometheus на локальном
+    порту. Возвращает runner для остановки или None, если порт не задан или
+    занят: второй экземпляр бота на хосте с тем же METRICS_PORT работает
+    дальше без endpoint.
+    """
+    if not port:
+        return None
+    from aiohttp import web
+
+    async def handler(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        log.warning("Метрики не подняты: порт %s:%s недоступен (%s). Задайте METRICS_PORT для каждого экземпляра", host, port, e)
+        await runner.cleanup()
+        return None
+    log.info("Метрики: http://%s:%s/metrics", host, port)
+    return runner
+
+
+# ----------------- Неблокирующие логи -----------------
+
+def setup_logging(path=LOGS_PATH, level=LOG_LEVEL):
+    """
+    Логгер pricebot пишет в очередь, а в файл и в stderr записи переносит
+    отдельный поток QueueListener, так что вызов log.info в обработчике или
+    в цикле по странам не трогает ни диск, ни консоль.
+    Возвращает listener; его нужно остановить при выходе (listener.stop()),
+    чтобы дописать остаток очереди.
+    """
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S")
+    formatter.converter = time.gmtime
+    file_handler = logging.FileHandler(path, encoding="utf-8")
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("pricebot")
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    return listener
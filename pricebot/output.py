@@ -0,0 +1,311 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+from collections import namedtuple
+import config
+from . import metrics, optional_module
+from .countries import country_index
+from .price_cache import result_cache, result_path
+from .shared_cache import atomic_write_path
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Схема строк результата -----------------
+
+# Единая схема строки цены для всех магазинов и форматов: (имя поля, тип, заголовок CSV).
+# Порядок и типы полей не меняются - на них рассчитывают загрузки в хранилище.
+PRICE_SCHEMA = (
+    ("store", str, "Store"),
+    ("app_id", str, "App ID"),
+    ("country", str, "Country"),
+    ("currency", str, "Currency"),
+    ("price_str", str, "Original Price"),
+    ("min_usd", float, "Min Price (USD)"),
+    ("max_usd", float, "Max Price (USD)"),
+    ("name", str, "IAP Name"),
+    ("duration", str, "Duration"),
+)
+PRICE_FIELDS = tuple(field for field, _, _ in PRICE_SCHEMA)
+CSV_HEADERS = {field: header for field, _, header in PRICE_SCHEMA}
+
+PriceRow = namedtuple("PriceRow", PRICE_FIELDS, defaults=('', ''))
+
+# Колонки CSV, которые бот отправляет пользователю
+GOOGLE_CSV_COLUMNS = ("min_usd", "max_usd", "country", "currency", "price_str")
+APPLE_CSV_COLUMNS = ("min_usd", "max_usd", "country", "currency", "price_str", "name", "duration")
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+PARQUET_BATCH_ROWS = 10000  # Строк в одной группе Parquet
+# Сохранять ли файлы результатов на диск (нужно для кэша); иначе CSV
+# собирается в памяти и отправляется без записи на диск
+PERSIST_RESULTS = getattr(config, "PERSIST_RESULTS", True)
+
+
+def format_for_path(path):
+    """
+    Формат вывода по расширению файла (по умолчанию CSV).
+    """
+    return FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+class RowWriter:
+    """
+    Базовый писатель строк PriceRow: write(row), write_rows(rows), close().
+    Строки пишутся по мере поступления, в памяти не накапливаются.
+    """
+
+    def __init__(self, path, columns=PRICE_FIELDS, append=False):
+        self.path = path
+        self.columns = tuple(columns)
+        self.append = append
+        self.rows_written = 0
+
+    def write(self, row):
+        self.write_rows((row,))
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open_text(path, append, newline=None):
+    """
+    path - имя файла либо уже открытый текстовый буфер (io.StringIO):
+    буфер не закрывается писателем. Возвращает (файл, нужно_ли_закрывать, файл_пустой).
+    """
+    if hasattr(path, "write"):
+        return path, False, path.tell() == 0
+    empty = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+    return open(path, mode='a' if append else 'w', newline=newline, encoding='utf-8'), True, empty
+
+
+class CsvRowWriter(RowWriter):
+    """
+    CSV с заголовками из PRICE_SCHEMA; при дописывании в непустой файл
+    заголовок повторно не пишется.
+    """
+
+    def __init__(self, path, columns=PRICE_FIELDS, append=False):
+        super().__init__(path, columns, append)
+        self._file, self._owns_file, new_file = _open_text(path, append, newline='')
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow([CSV_HEADERS[column] for column in self.columns])
+
+    def write_rows(self, rows):
+        columns = self.columns
+        for row in rows:
+            self._writer.writerow([getattr(row, column) for column in columns])
+            self.rows_written += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+
+class JsonlRowWriter(RowWriter):
+    """
+    Одна строка - один JSON-объект с полями схемы; цены - числа.
+    """
+
+    def __init__(self, path, columns=PRICE_FIELDS, append=False):
+        super().__init__(path, columns, append)
+        self._file, self._owns_file, _ = _open_text(path, append)
+
+    def write_rows(self, rows):
+        columns = self.columns
+        for row in rows:
+            self._file.write(json.dumps(
+                {column: getattr(row, column) for column in columns}, ensure_ascii=False
+            ))
+            self._file.write('\n')
+            self.rows_written += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+
+class ParquetRowWriter(RowWriter):
+    """
+    Parquet через pyarrow: строки копятся до PARQUET_BATCH_ROWS и пишутся
+    отдельной группой строк, так что память не растёт с размером прогона.
+    Дописывать в существующий файл Parquet нельзя.
+    """
+
+    def __init__(self, path, columns=PRICE_FIELDS, append=False):
+        # pyarrow необязателен и тяжёл: импортируется только для Parquet
+        pyarrow = optional_module("pyarrow")
+        if pyarrow is None:
+            raise RuntimeError("Для вывода в Parquet нужен пакет pyarrow")
+        optional_module("pyarrow.parquet")
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise ValueError(f"Нельзя дописать в существующий файл Parquet: {path}")
+        super().__init__(path, columns, append)
+        types = {field: (pyarrow.float64() if kind is float else pyarrow.string()) for field, kind, _ in PRICE_SCHEMA}
+        self.schema = pyarrow.schema([(column, types[column]) for column in self.columns])
+        self._pyarrow = pyarrow
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self._batch = {column: [] for column in self.columns}
+        self._batch_rows = 0
+
+    def write_rows(self, rows):
+        batch = self._batch
+        for row in rows:
+            for column, values in batch.items():
+                values.append(getattr(row, column))
+            self._batch_rows += 1
+            self.rows_written += 1
+            if self._batch_rows >= PARQUET_BATCH_ROWS:
+                self.flush()
+
+    def flush(self):
+        if self._batch_rows:
+            self._writer.write_table(self._pyarrow.Table.from_pydict(self._batch, schema=self.schema))
+            self._batch = {column: [] for column in self.columns}
+            self._batch_rows = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+class SortedRowWriter(RowWriter):
+    """
+    Копит строки и при закрытии передаёт их в writer, отсортированными по
+    Min Price; при равной цене сохраняется порядок поступления. Нужен только
+    там, где сортировка важнее потоковой записи (файл для пользователя бота).
+    """
+
+    def __init__(self, writer, key=lambda row: row.min_usd):
+        super().__init__(writer.path, writer.columns, writer.append)
+        self.writer = writer
+        self.key = key
+        self._rows = []
+
+    def write_rows(self, rows):
+        self._rows.extend(rows)
+
+    def close(self):
+        # sorted устойчива: строки с равной ценой остаются в исходном порядке
+        self.writer.write_rows(sorted(self._rows, key=self.key))
+        self.rows_written = self.writer.rows_written
+        self._rows = []
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvRowWriter, "jsonl": JsonlRowWriter, "parquet": ParquetRowWriter}
+
+
+def open_writer(path, fmt=None, columns=PRICE_FIELDS, sort_key=None, append=False):
+    """
+    Открывает писатель нужного формата (по умолчанию - по расширению path).
+    С sort_key строки буферизуются и пишутся отсортированными при закрытии.
+    """
+    writer = WRITERS[fmt or format_for_path(path)](path, columns, append)
+    return SortedRowWriter(writer, sort_key) if sort_key else writer
+
+
+def render_rows(rows, fmt="csv", columns=PRICE_FIELDS, sort_key=None):
+    """
+    Строки результата целиком в памяти (CSV или JSONL, UTF-8) - для отправки
+    без записи на диск.
+    """
+    buffer = io.StringIO()
+    with open_writer(buffer, fmt, columns, sort_key) as writer:
+        writer.write_rows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+# ----------------- Готовый файл результата -----------------
+
+class ResultFile:
+    """
+    Файл результата для отправки пользователю: либо путь на диске (path),
+    либо содержимое в памяти (data), если результат не сохраняется.
+    """
+    __slots__ = ("name", "path", "data")
+
+    def __init__(self, name, path=None, data=None):
+        self.name = name
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def from_path(cls, path):
+        return cls(os.path.basename(path), path=path)
+
+    async def read(self):
+        """
+        Содержимое файла; чтение с диска идёт в пуле потоков, а не в event loop.
+        """
+        if self.data is not None:
+            return self.data
+        return await asyncio.to_thread(_read_bytes, self.path)
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def result_sort_key(row):
+    # По возрастанию Min Price, при равной цене - в порядке стран и уровней
+    return row.min_usd, country_index[row.country]
+
+
+def write_result_file(filepath, rows, columns):
+    # Файл может читать другой процесс бота: пишем рядом и подменяем целиком
+    with atomic_write_path(filepath) as tmp_path:
+        with open_writer(tmp_path, "csv", columns=columns, sort_key=result_sort_key) as writer:
+            writer.write_rows(rows)
+
+
+async def save_result(store, app_id, rows, columns, complete=True):
+    """
+    Готовит файл результата для пользователя. При PERSIST_RESULTS пишет
+    непустой CSV на диск (в пуле потоков) и кэширует его, иначе собирает CSV
+    в памяти. Пустой результат тоже собирается в памяти, чтобы не затереть
+    хороший файл, который могли записать раньше или другой процесс, как и
+    неполный (complete=False: часть стран не ответила или отсечена планом) -
+    его не кэшируем.
+    Возвращает ResultFile. Если файл записать не удалось, бросает исключение:
+    на диске мог остаться старый файл, и отправлять его вместо нового нельзя.
+    """
+    filepath = result_path(store, app_id)
+    if not PERSIST_RESULTS or not rows or not complete:
+        with metrics.span("write", store):
+            data = await asyncio.to_thread(render_rows, rows, "csv", columns, result_sort_key)
+        return ResultFile(os.path.basename(filepath), data=data)
+    try:
+        with metrics.span("write", store):
+            await asyncio.to_thread(write_result_file, filepath, rows, columns)
+    except Exception as e:
+        log.error("Ошибка записи результата %s:%s: %s", store, app_id, e)
+        raise
+    try:
+        await result_cache.put(store, app_id, filepath)
+    except Exception as e:
+        # Файл записан целиком - его можно отправить, просто он не попал в кэш
+        log.error("Не удалось закэшировать результат %s:%s: %s", store, app_id, e)
+    return ResultFile.from_path(filepath)
@@ -0,0 +1,132 @@
+import codecs
+import json
+import re
+from . import optional_module
+
+# ----------------- Потоковый разбор страницы Google Play -----------------
+
+INAPP_MARKER = "In-app purchases"
+NOT_FOUND_MARKER = "We're sorry, the requested URL was not found on this server."
+PRICE_RE = re.compile(r'"([^"]*?\sper\sitem)",')
+CHUNK_SIZE = 16 * 1024
+# Больше этого хвост незакрытой строки не держим: строки цен короткие
+MAX_CARRY = 4096
+
+
+class PlayPageScanner:
+    """
+    Разбирает страницу приложения по кускам, не собирая её целиком в памяти.
+    За один проход ищет маркер "In-app purchases", маркер 404 и все строки
+    вида "XXX per item". Между кусками хранится только короткий хвост,
+    чтобы не терять совпадения на границе.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._carry = ''        # незакрытая строка в кавычках с конца прошлого куска
+        self._marker_tail = ''  # хвост прошлого куска для поиска маркеров на стыке
+        self.has_inapp = False
+        self.is_404 = False
+        self.prices = []
+        self._seen = set()
+        self.chars_seen = 0       # Сколько символов страницы разобрано
+        self._last_price_at = 0   # chars_seen на момент последней новой цены
+
+    def feed_bytes(self, chunk, final=False):
+        self.feed(self._decoder.decode(chunk, final))
+
+    def feed(self, text):
+        if not text:
+            return
+        self.chars_seen += len(text)
+        self._find_markers(text)
+
+        buffer = self._carry + text
+        last_end = 0
+        for match in PRICE_RE.finditer(buffer):
+            price = match.group(1)
+            if price not in self._seen:
+                self._seen.add(price)
+                self.prices.append(price)
+                self._last_price_at = self.chars_seen
+            last_end = match.end()
+        self._carry = self._unfinished_tail(buffer, last_end)
+
+    def _find_markers(self, text):
+        window = self._marker_tail + text
+        if not self.has_inapp and INAPP_MARKER in window:
+            self.has_inapp = True
+        if not self.is_404 and NOT_FOUND_MARKER in window:
+            self.is_404 = True
+        keep = len(NOT_FOUND_MARKER) - 1
+        self._marker_tail = window[-keep:]
+
+    def is_settled(self, window):
+        """
+        True, если дочитывать страницу незачем: найден маркер 404, либо цены
+        уже найдены и после последней новой цены прошло не меньше window символов.
+        """
+        if self.is_404:
+            return True
+        return self.has_inapp and bool(self.prices) and self.chars_seen - self._last_price_at >= window
+
+    @staticmethod
+    def _unfinished_tail(buffer, last_end):
+        """
+        Совпадение, которое может продолжиться в следующем куске, начинается
+        с последней кавычки, либо с предпоследней, если последняя стоит в самом
+        конце буфера (тогда ещё неизвестно, идёт ли за ней запятая).
+        """
+        last_quote = buffer.rfind('"', last_end)
+        if last_quote == -1:
+            return ''
+        if last_quote == len(buffer) - 1:
+            previous = buffer.rfind('"', last_end, last_quote)
+            if previous != -1:
+                last_quote = previous
+        tail = buffer[last_quote:]
+        return tail if len(tail) <= MAX_CARRY else ''
+
+    def close(self):
+        self.feed(self._decoder.decode(b'', True))
+
+
+# ----------------- Ответ Sensor Tower -----------------
+
+
+async def read_country_iaps(response, country_code):
+    """
+    Достаёт из ответа Sensor Tower список top_in_app_purchases[country_code].
+    Если установлен ijson, JSON разбирается потоково прямо из сокета и в память
+    попадают только IAP нужной страны; иначе байты ответа разбираются json.loads
+    без промежуточного декодирования в строку.
+    """
+    ijson = optional_module("ijson")
+    if ijson is not None:
+        prefix = f"top_in_app_purchases.{country_code}.item"
+        return [iap async for iap in ijson.items(response.content, prefix, use_float=True)]
+
+    data = json.loads(await response.read())
+    return data.get("top_in_app_purchases", {}).get(country_code)
+
+
+# ----------------- Ссылки на приложения -----------------
+
+LINK_ERRORS = {
+    "google": "Не удалось найти идентификатор приложения в Google Play ссылке.",
+    "apple": "Не удалось найти идентификатор приложения (idNNN) в App Store ссылке.",
+}
+
+
+def parse_app_link(text):
+    """
+    Возвращает (магазин, id приложения); id = None, если магазин распознан,
+    а идентификатор нет, и (None, None) для нераспознанной ссылки.
+    """
+    if "play.google.com" in text:
+        match = re.search(r'id=([\w\d\.]+)', text)
+        return "google", match.group(1) if match else None
+    if "apps.apple.com" in text:
+        match = re.search(r'/id(\d+)', text)
+        return "apple", match.group(1) if match else None
+    return None, None
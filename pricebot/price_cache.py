@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+import config
+from .shared_cache import shared_results
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Кэш результатов сканирования -----------------
+
+CACHE_TTL = getattr(config, "CACHE_TTL_HOURS", 24) * 3600         # Срок жизни результата, сек
+CACHE_MAX_ENTRIES = getattr(config, "CACHE_MAX_ENTRIES", 1000)     # Сколько записей держим в памяти
+CSV_MAX_AGE = getattr(config, "CSV_MAX_AGE_HOURS", 72) * 3600      # Старше этого CSV удаляются с диска
+CLEANUP_INTERVAL = 3600                                            # Как часто запускать очистку, сек
+
+# Имена файлов с результатами для каждого магазина
+RESULT_FILENAMES = {
+    "google": "{app_id}_google.csv",
+    "apple": "{app_id}_apple.csv",
+}
+
+
+def result_path(store, app_id):
+    """
+    Путь к CSV с результатом сканирования приложения в магазине store.
+    """
+    return os.path.join(config.CONST_PATH, RESULT_FILENAMES[store].format(app_id=app_id))
+
+
+def _has_rows(filepath):
+    """
+    True, если в CSV есть хотя бы одна строка после заголовка.
+    """
+    try:
+        with open(filepath, encoding='utf-8') as f:
+            f.readline()
+            return bool(f.readline().strip())
+    except OSError:
+        return False
+
+
+class PriceCache:
+    """
+    LRU-кэш с TTL: ключ (store, app_id) -> путь к готовому CSV.
+    Сами данные лежат на диске, в памяти только индекс. Если записи нет в памяти
+    (после перезапуска или если сканировал другой процесс), она ищется в общем
+    индексе shared_results, а затем - свежий CSV на диске.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (store, app_id) -> (время сохранения, путь)
+        self._last_cleanup = 0.0
+
+    async def get(self, store, app_id):
+        """
+        Возвращает путь к свежему CSV или None. Обращения к диску (проверка
+        файла, подхват после перезапуска) идут в пуле потоков.
+        """
+        key = (store, app_id)
+        entry = self._entries.get(key)
+        in_memory = entry is not None
+        if not in_memory:
+            entry = await asyncio.to_thread(shared_results.lookup, store, app_id)
+        filepath = result_path(store, app_id) if entry is None else entry[1]
+        saved_at = await asyncio.to_thread(_probe, filepath, entry is None)
+        if saved_at is None:
+            # Файла нет или он от неудачного сканирования (только заголовок)
+            self._entries.pop(key, None)
+            return None
+
+        if entry is None:
+            entry = (saved_at, filepath)
+        if not in_memory:
+            self._store(key, tuple(entry))
+        if time.time() - entry[0] >= self.ttl:
+            self._entries.pop(key, None)
+            return None
+
+        self._entries.move_to_end(key)
+        log.info("Кэш-хит для %s:%s", store, app_id)
+        return filepath
+
+    async def put(self, store, app_id, filepath):
+        """
+        Запоминает результат и публикует его в общем индексе для других процессов.
+        """
+        saved_at = time.time()
+        self._store((store, app_id), (saved_at, filepath))
+        await asyncio.to_thread(shared_results.publish, store, app_id, filepath, saved_at)
+        log.info("Сохранено в кэш: %s:%s", store, app_id)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def cleanup(self, max_age=CSV_MAX_AGE):
+        """
+        Выкидывает из памяти просроченные записи, удаляет с диска старые CSV
+        и недописанные временные файлы, чистит общий индекс (в пуле потоков).
+        """
+        now = time.time()
+        self._last_cleanup = now
+        for key, (saved_at, _) in list(self._entries.items()):
+            if now - saved_at >= self.ttl:
+                del self._entries[key]
+        await asyncio.to_thread(_remove_old_results, now - max_age)
+        await asyncio.to_thread(shared_results.prune, now - max_age)
+
+    async def maybe_cleanup(self):
+        """
+        Запускает cleanup не чаще раза в CLEANUP_INTERVAL секунд.
+        """
+        if time.time() - self._last_cleanup >= CLEANUP_INTERVAL:
+            await self.cleanup()
+
+
+def _probe(filepath, check_rows):
+    """
+    Время изменения файла либо None, если его нет (или в нём нет строк при check_rows).
+    """
+    try:
+        saved_at = os.path.getmtime(filepath)
+    except OSError:
+        return None
+    if check_rows and not _has_rows(filepath):
+        return None
+    return saved_at
+
+
+def _remove_old_results(cutoff):
+    try:
+        names = os.listdir(config.CONST_PATH)
+    except OSError as e:
+        log.warning("Ошибка при сканировании директории: %s", e)
+        return
+    for name in names:
+        # *.tmp - файлы, которые процесс не успел дописать и переименовать
+        if not name.endswith((".csv", ".tmp")):
+            continue
+        path = os.path.join(config.CONST_PATH, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                log.info("Удален старый файл: %s", path)
+        except OSError:
+            pass
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые сканирования: первый вызов с ключом
+    (store, app_id) запускает работу, остальные ждут тот же результат.
+    Сама работа идёт в отдельной задаче, поэтому отмена одного из ожидающих
+    не прерывает сканирование для остальных.
+    """
+
+    def __init__(self):
+        self._inflight = {}  # ключ -> asyncio.Task
+
+    def is_running(self, key):
+        return key in self._inflight
+
+    def start(self, key, func):
+        """
+        Запускает func() под ключом, если такая работа ещё не идёт, и
+        возвращает её задачу, не дожидаясь результата.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def _forget(self, key, task):
+        self._inflight.pop(key, None)
+        # Ошибку получают ожидающие; если их уже нет (ответ отдан раньше
+        # конца сканирования), забираем её сами, чтобы asyncio не ругался
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key, func):
+        return await asyncio.shield(self.start(key, func))
+
+    async def cancel_all(self):
+        """
+        Отменяет всю идущую работу и ждёт, пока она завершится (при остановке).
+        """
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+result_cache = PriceCache()
+scan_flights = SingleFlight()
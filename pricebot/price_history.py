@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+import config
+
+# ----------------- История цен -----------------
+
+HISTORY_DB_PATH = getattr(config, "HISTORY_DB_PATH", os.path.join(config.CONST_PATH, "price_history.sqlite3"))
+COUNTRY_MAX_AGE = getattr(config, "COUNTRY_MAX_AGE_HOURS", 24) * 3600  # Старше - страну сканируем заново
+
+# Статусы, после которых страна считается просканированной; таймауты и ошибки
+# в историю не пишутся, такие страны остаются устаревшими
+DEFINITIVE_STATUSES = {'ok', 'noinapp', '404'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS country_scans (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    store      TEXT NOT NULL,
+    app_id     TEXT NOT NULL,
+    country    TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS country_scans_lookup ON country_scans (app_id, country, scanned_at);
+CREATE TABLE IF NOT EXISTS prices (
+    scan_id    INTEGER NOT NULL REFERENCES country_scans (id),
+    currency   TEXT NOT NULL,
+    price_str  TEXT NOT NULL,
+    min_usd    REAL NOT NULL,
+    max_usd    REAL NOT NULL,
+    name       TEXT NOT NULL DEFAULT '',
+    duration   TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS prices_scan ON prices (scan_id);
+"""
+
+# Последнее и предпоследнее сканирование каждой страны приложения
+_LATEST_SCANS = """
+SELECT id, country, status, scanned_at FROM (
+    SELECT id, country, status, scanned_at,
+           ROW_NUMBER() OVER (PARTITION BY country ORDER BY scanned_at DESC, id DESC) AS age
+    FROM country_scans WHERE store = ? AND app_id = ?
+) WHERE age <= ? ORDER BY country, scanned_at DESC, id DESC
+"""
+
+
+class PriceHistory:
+    """
+    Журнал сканирований в SQLite: только добавление, ничего не перезаписывается.
+    Каждое сканирование страны - строка country_scans, найденные цены -
+    строки prices. Позволяет пересканировать только устаревшие страны и
+    показывать, где цены изменились.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def _db(self):
+        # База открывается при первом обращении, а не при импорте модуля.
+        # WAL и ожидание блокировки - чтобы в историю могли писать несколько процессов
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def record_scan(self, store, app_id, results, scanned_at=None):
+        """
+        results: {country: (status, [(currency, price_str, min_usd, max_usd, name, duration), ...])}
+        """
+        scanned_at = time.time() if scanned_at is None else scanned_at
+        with self._lock, self._db:
+            for country, (status, rows) in results.items():
+                if status not in DEFINITIVE_STATUSES:
+                    continue
+                scan_id = self._db.execute(
+                    "INSERT INTO country_scans (store, app_id, country, status, scanned_at) VALUES (?, ?, ?, ?, ?)",
+                    (store, app_id, country, status, scanned_at)
+                ).lastrowid
+                self._db.executemany(
+                    "INSERT INTO prices (scan_id, currency, price_str, min_usd, max_usd, name, duration) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(scan_id, *row) for row in rows]
+                )
+
+    def _latest(self, store, app_id, depth):
+        """
+        {country: [(scan_id, status, scanned_at, rows), ...]} - до depth последних сканирований.
+        """
+        with self._lock:
+            scans = self._db.execute(_LATEST_SCANS, (store, app_id, depth)).fetchall()
+            rows_by_scan = {}
+            if scans:
+                placeholders = ','.join('?' * len(scans))
+                for scan_id, *row in self._db.execute(
+                    f"SELECT scan_id, currency, price_str, min_usd, max_usd, name, duration "
+                    f"FROM prices WHERE scan_id IN ({placeholders}) ORDER BY rowid",
+                    [scan[0] for scan in scans]
+                ):
+                    rows_by_scan.setdefault(scan_id, []).append(tuple(row))
+        latest = {}
+        for scan_id, country, status, scanned_at in scans:
+            latest.setdefault(country, []).append((scan_id, status, scanned_at, rows_by_scan.get(scan_id, [])))
+        return latest
+
+    def latest_countries(self, store, app_id):
+        """
+        Последнее сканирование каждой страны: {country: (status, scanned_at, rows)}.
+        """
+        return {
+            country: (status, scanned_at, rows)
+            for country, [(_, status, scanned_at, rows)] in self._latest(store, app_id, 1).items()
+        }
+
+    def fresh_countries(self, store, app_id, max_age=COUNTRY_MAX_AGE):
+        """
+        Страны, просканированные не раньше max_age секунд назад:
+        {country: (status, rows последнего сканирования)}.
+        """
+        cutoff = time.time() - max_age
+        return {
+            country: (status, rows)
+            for country, (status, scanned_at, rows) in self.latest_countries(store, app_id).items()
+            if scanned_at >= cutoff
+        }
+
+    def diff(self, store, app_id):
+        """
+        Страны, где последнее сканирование отличается от предыдущего:
+        [(country, старые_цены, новые_цены)], цены - отсортированные строки цен.
+        """
+        changes = []
+        for country, scans in self._latest(store, app_id, 2).items():
+            if len(scans) < 2:
+                continue
+            (_, new_status, _, new_rows), (_, old_status, _, old_rows) = scans
+            new_prices = sorted(row[1] for row in new_rows)
+            old_prices = sorted(row[1] for row in old_rows)
+            if new_status != old_status or new_prices != old_prices:
+                changes.append((country, old_prices, new_prices))
+        return changes
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+price_history = PriceHistory()
@@ -0,0 +1,198 @@
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import config
+from .scan_progress import CHEAPEST_MARGIN
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Планировщик порядка стран -----------------
+
+PLANNER_STATS_PATH = getattr(config, "PLANNER_STATS_PATH", os.path.join(config.CONST_PATH, "planner_stats.json"))
+PLANNER_Z = getattr(config, "PLANNER_Z", 2.0)  # На сколько σ страна может оказаться дешевле обычного
+PLANNER_EXPLORE_EVERY = getattr(config, "PLANNER_EXPLORE_EVERY", 10)  # Каждое N-е сканирование магазина - полное
+PLANNER_ALPHA = 0.1        # Вес нового сканирования в скользящих среднем и дисперсии
+PLANNER_MIN_SPREAD = 0.15  # Меньше этого σ не считаем: даже стабильной стране оставляем запас
+PLANNER_MIN_SCANS = 3      # Меньше наблюдений - статистике страны не доверяем
+
+
+def country_minimums(rows):
+    """
+    {country: минимальная цена в USD} по строкам результата (PriceRow).
+    """
+    minimums = {}
+    for row in rows:
+        if row.min_usd > 0 and row.min_usd < minimums.get(row.country, math.inf):
+            minimums[row.country] = row.min_usd
+    return minimums
+
+
+class ScanPlan:
+    """
+    План одного сканирования. Итерация отдаёт страны в порядке order; с budget
+    первые budget стран отдаются всегда, а дальше - только пока оставшиеся
+    могут оказаться дешевле уже найденного минимума. Сканер сообщает цены
+    каждой готовой страны через record().
+    Нижняя граница цены непроверенной страны - её прошлая цена у этого
+    приложения со скидкой CHEAPEST_MARGIN, а если приложение там не
+    сканировалось - оценка по статистике магазина: «базовая цена» приложения
+    (медиана min_usd / e^mean по проверенным странам), умноженная на
+    e^(mean - PLANNER_Z·σ) страны.
+    """
+
+    def __init__(self, order, budget=None, stats=None, priors=None):
+        self.order = order
+        self.budget = budget
+        self.stats = stats or {}
+        self.priors = priors or {}
+        self.minimums = {}  # страна -> минимальная цена в USD
+        self.skipped = []
+
+    def __iter__(self):
+        for position, country in enumerate(self.order):
+            if self.budget is not None and position >= self.budget and self.can_stop(self.order[position:]):
+                self.skipped = self.order[position:]
+                return
+            yield country
+
+    def record(self, country, rows):
+        """
+        rows - строки цен страны (currency, price_str, min_usd, ...), как в истории цен.
+        """
+        prices = [row[2] for row in rows if row[2] > 0]
+        if prices:
+            self.minimums[country] = min(prices)
+
+    def _base_price(self):
+        bases = [
+            price / math.exp(self.stats[country][1])
+            for country, price in self.minimums.items()
+            if self.stats.get(country, (0,))[0] >= PLANNER_MIN_SCANS
+        ]
+        return statistics.median(bases) if bases else None
+
+    def floor(self, country, base):
+        """
+        Ниже какой цены страна, скорее всего, не окажется; None - неизвестно.
+        """
+        prior = self.priors.get(country)
+        if prior is not None:
+            return prior * (1 - CHEAPEST_MARGIN)
+        n, mean, var = self.stats.get(country, (0, 0.0, 0.0))
+        if base is None or n < PLANNER_MIN_SCANS:
+            return None
+        return base * math.exp(mean - PLANNER_Z * max(math.sqrt(var), PLANNER_MIN_SPREAD))
+
+    def can_stop(self, remaining):
+        if not self.minimums:
+            return False
+        current = min(self.minimums.values())
+        base = self._base_price()
+        for country in remaining:
+            floor = self.floor(country, base)
+            if floor is None or floor <= current:
+                return False
+        return True
+
+
+class ScanPlanner:
+    """
+    Учит, какие страны обычно дешевле. После каждого сканирования для всех
+    стран с ценами берётся log(min_usd страны / min_usd самой дешёвой страны),
+    и по магазину копятся скользящие среднее и дисперсия этой величины.
+    Страны с меньшим средним сканируются первыми, страны без статистики -
+    ещё раньше, чтобы она набралась. Статистика хранится в JSON
+    (PLANNER_STATS_PATH) и пишется после каждого сканирования.
+    """
+
+    def __init__(self, path=PLANNER_STATS_PATH):
+        self.path = path
+        self._stats = None
+        self._lock = threading.RLock()
+
+    @property
+    def stats(self):
+        # {store: {"scans": N, "countries": {country: [n, mean, var]}}};
+        # файл читается при первом обращении, а не при импорте модуля
+        if self._stats is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._stats = json.load(f)
+            except (OSError, ValueError):
+                self._stats = {}
+        return self._stats
+
+    def _store_stats(self, store):
+        return self.stats.setdefault(store, {"scans": 0, "countries": {}})
+
+    def order(self, store, countries):
+        """
+        countries в порядке сканирования: сначала страны без статистики, потом
+        по возрастанию среднего отношения к самой дешёвой стране.
+        """
+        with self._lock:
+            known = dict(self._store_stats(store)["countries"])
+
+        def key(country):
+            n, mean, _ = known.get(country, (0, 0.0, 0.0))
+            return (0, 0.0) if n < PLANNER_MIN_SCANS else (1, mean)
+
+        return sorted(countries, key=key)
+
+    def plan(self, store, countries, budget=None, priors=None):
+        """
+        ScanPlan для countries. Каждое PLANNER_EXPLORE_EVERY-е сканирование
+        магазина идёт без бюджета, чтобы статистика не застывала для стран,
+        которые обычно отсекаются.
+        """
+        with self._lock:
+            store_stats = self._store_stats(store)
+            if budget is not None and store_stats["scans"] % PLANNER_EXPLORE_EVERY == 0:
+                budget = None
+            return ScanPlan(self.order(store, countries), budget, dict(store_stats["countries"]), priors)
+
+    def learn(self, store, minimums, fetched=None):
+        """
+        Учитывает итог сканирования: minimums - {country: минимальная цена в USD}
+        по всему результату, вместе со странами из истории: от самой дешёвой
+        из них считаются отношения. Статистика обновляется только для стран
+        из fetched (по умолчанию - для всех): цены из истории уже учтены,
+        когда их сканировали. Вызывается из потока: пишет файл.
+        """
+        if len(minimums) < 2:
+            return
+        learned = [country for country in minimums if fetched is None or country in fetched]
+        if not learned:
+            return
+        cheapest = min(minimums.values())
+        with self._lock:
+            store_stats = self._store_stats(store)
+            known = store_stats["countries"]
+            for country in learned:
+                price = minimums[country]
+                ratio = math.log(price / cheapest)
+                n, mean, var = known.get(country, (0, 0.0, 0.0))
+                if n == 0:
+                    mean, var = ratio, 0.0
+                else:
+                    delta = ratio - mean
+                    mean += PLANNER_ALPHA * delta
+                    var = (1 - PLANNER_ALPHA) * (var + PLANNER_ALPHA * delta * delta)
+                known[country] = [n + 1, mean, var]
+            store_stats["scans"] += 1
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("Не удалось сохранить статистику планировщика: %s", e)
+
+
+scan_planner = ScanPlanner()
@@ -0,0 +1,166 @@
+import asyncio
+import contextvars
+import logging
+import math
+import config
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Ход сканирования -----------------
+
+PROGRESS_EDIT_INTERVAL = getattr(config, "PROGRESS_EDIT_INTERVAL", 3.0)  # Не чаще одной правки сообщения, сек
+CHEAPEST_MARGIN = getattr(config, "CHEAPEST_MARGIN", 0.25)  # Запас на изменение цен и курсов с прошлого скана
+
+# Ход текущего сканирования: кладётся в контекст задачи сканирования, сканеры
+# магазинов сообщают в него о каждой готовой стране (None - никто не смотрит)
+current_progress = contextvars.ContextVar("current_progress", default=None)
+
+
+def priors_from_history(latest):
+    """
+    Минимальная цена в USD по прошлому сканированию каждой страны из
+    price_history.latest_countries; inf - страна сканировалась, но цен не было.
+    """
+    return {
+        country: min((row[2] for row in rows), default=math.inf)
+        for country, (_, _, rows) in latest.items()
+    }
+
+
+class ScanProgress:
+    """
+    Состояние идущего сканирования: какие страны уже готовы и самая низкая
+    цена в USD по каждой. Сканеры вызывают report() для каждой страны,
+    подписчики (сообщения статуса задач, ждущих это сканирование) вызываются
+    сразу после этого и сами решают, как часто обновляться.
+    priors - цены стран по прошлому сканированию (см. priors_from_history),
+    по ним is_settled решает, может ли непроверенная страна стать дешевле.
+    """
+
+    def __init__(self, countries, priors=None):
+        self.countries = list(countries)
+        self.priors = priors or {}
+        self.done = set()
+        self.best = {}  # страна -> (min_usd, price_str, currency)
+        self.finished = False
+        self._listeners = []
+
+    @classmethod
+    def from_history(cls, countries, latest):
+        """
+        Завершённое «сканирование» из последних записей истории цен.
+        """
+        progress = cls(countries, priors_from_history(latest))
+        for country, (_, _, rows) in latest.items():
+            progress.report(country, rows)
+        progress.finish()
+        return progress
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+        listener(self)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            listener(self)
+
+    def report(self, country, rows):
+        """
+        Страна готова. rows - строки цен как в истории цен:
+        (currency, price_str, min_usd, ...); пустой список - цен нет или
+        страна не ответила.
+        """
+        self.done.add(country)
+        priced = [row for row in rows if row[2] > 0]
+        if priced:
+            currency, price_str, min_usd = min(priced, key=lambda row: row[2])[:3]
+            self.best[country] = (min_usd, price_str, currency)
+        self._notify()
+
+    def finish(self):
+        self.finished = True
+        self._notify()
+
+    def cheapest(self, k):
+        """
+        k самых дешёвых стран на сейчас: [(min_usd, country, price_str, currency)].
+        """
+        return sorted(
+            (min_usd, country, price_str, currency)
+            for country, (min_usd, price_str, currency) in self.best.items()
+        )[:k]
+
+    def is_settled(self, k, margin=CHEAPEST_MARGIN):
+        """
+        Верно, если k самых дешёвых стран уже, скорее всего, не изменятся:
+        у каждой непроверенной страны прошлая цена даже со скидкой margin
+        выше k-й цены на сейчас. Страна без истории может оказаться любой,
+        поэтому её приходится дождаться.
+        """
+        if self.finished:
+            return True
+        top = self.cheapest(k)
+        if len(top) < k:
+            return False
+        threshold = top[-1][0]
+        for country in self.countries:
+            if country in self.done:
+                continue
+            prior = self.priors.get(country)
+            if prior is None or prior * (1 - margin) <= threshold:
+                return False
+        return True
+
+
+def _retry_after_seconds(error):
+    # telegram.error.RetryAfter: retry_after - число секунд или timedelta
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        return None
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class DebouncedEditor:
+    """
+    Правит одно сообщение не чаще interval секунд: update() только запоминает
+    текст, отправляется всегда последний из накопившихся. Одинаковый текст
+    повторно не отправляется. Если сервер просит подождать (RetryAfter),
+    следующая правка откладывается на указанное время.
+    edit(text) - корутина, которая правит сообщение.
+    """
+
+    def __init__(self, edit, interval=PROGRESS_EDIT_INTERVAL):
+        self.edit = edit
+        self.interval = interval
+        self._text = None
+        self._sent = None
+        self._next_at = 0.0
+        self._task = None
+
+    def update(self, text):
+        self._text = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._send_pending())
+
+    async def _send_pending(self):
+        loop = asyncio.get_running_loop()
+        while self._text != self._sent:
+            delay = self._next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            text = self._text
+            self._next_at = loop.time() + self.interval
+            try:
+                await self.edit(text)
+            except Exception as e:
+                retry_after = _retry_after_seconds(e)
+                if retry_after is None:
+                    log.warning("Не удалось обновить сообщение статуса: %s", e)
+                else:
+                    self._next_at = loop.time() + retry_after
+                    continue
+            self._sent = text
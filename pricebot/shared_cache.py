@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import config
+from . import metrics
+
+log = logging.getLogger("pricebot")
+
+# ----------------- Общий кэш нескольких процессов -----------------
+
+SHARED_CACHE_PATH = getattr(config, "SHARED_CACHE_PATH", os.path.join(config.CONST_PATH, "shared_cache.sqlite3"))
+LEASE_TTL = getattr(config, "SCAN_LEASE_TTL", 60)  # Аренда сканирования без продления истекает через, сек
+LEASE_POLL_INTERVAL = 0.5                          # Как часто ждущий процесс проверяет аренду, сек
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    store    TEXT NOT NULL,
+    app_id   TEXT NOT NULL,
+    path     TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    PRIMARY KEY (store, app_id)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    store      TEXT NOT NULL,
+    app_id     TEXT NOT NULL,
+    owner      TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (store, app_id)
+);
+"""
+
+HOSTNAME = socket.gethostname()
+
+
+@contextmanager
+def atomic_write_path(path):
+    """
+    Путь временного файла рядом с path; после успешного блока он
+    переименовывается в path одним os.replace, так что другие процессы видят
+    либо старый файл целиком, либо новый, но не недописанный.
+        with atomic_write_path(filepath) as tmp_path:
+            write(tmp_path)
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _owner_alive(owner):
+    """
+    Жив ли процесс-владелец аренды. Проверить можно только процесс этого же
+    хоста; про чужие считаем, что живы, пока аренда не истекла.
+    """
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != HOSTNAME:
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+
+class SharedResults:
+    """
+    Индекс готовых результатов и аренды сканирований в SQLite (WAL), общий
+    для всех процессов бота на хосте.
+    results: (store, app_id) -> путь к файлу и время сохранения; процесс,
+    у которого нет записи в памяти, находит здесь результат, сделанный другим.
+    leases: кто сейчас сканирует (store, app_id). Аренда продлевается, пока
+    сканирование идёт; процесс, нашедший чужую аренду, ждёт результат
+    владельца вместо того, чтобы сканировать то же самое. Аренду упавшего
+    процесса перехватывают: сразу, если он был на этом хосте, иначе по
+    истечении LEASE_TTL.
+    """
+
+    def __init__(self, path=SHARED_CACHE_PATH, lease_ttl=LEASE_TTL):
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.owner = f"{HOSTNAME}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = None
+        self._lock = threading.Lock()
+        self._renewals = {}  # (store, app_id) -> задача продления аренды
+
+    @property
+    def _db(self):
+        # База открывается при первом обращении, а не при импорте модуля
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def lookup(self, store, app_id):
+        """
+        (saved_at, path) последнего опубликованного результата или None.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT saved_at, path FROM results WHERE store = ? AND app_id = ?", (store, app_id)
+            ).fetchone()
+
+    def publish(self, store, app_id, path, saved_at=None):
+        saved_at = time.time() if saved_at is None else saved_at
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (store, app_id, path, saved_at) VALUES (?, ?, ?, ?)",
+                (store, app_id, path, saved_at)
+            )
+
+    def prune(self, cutoff):
+        """
+        Удаляет записи о результатах старше cutoff и истёкшие аренды.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM results WHERE saved_at < ?", (cutoff,))
+            self._db.execute("DELETE FROM leases WHERE expires_at < ?", (time.time(),))
+
+    def _try_acquire(self, store, app_id):
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE берёт блокировку записи до чтения: два процесса
+            # не могут одновременно решить, что аренда свободна
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT owner, expires_at FROM leases WHERE store = ? AND app_id = ?", (store, app_id)
+                ).fetchone()
+                if row is not None and row[0] != self.owner and row[1] > now and _owner_alive(row[0]):
+                    self._db.execute("COMMIT")
+                    return False
+                self._db.execute(
+                    "INSERT OR REPLACE INTO leases (store, app_id, owner, expires_at) VALUES (?, ?, ?, ?)",
+                    (store, app_id, self.owner, now + self.lease_ttl)
+                )
+                self._db.execute("COMMIT")
+                return True
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _renew(self, store, app_id):
+        with self._lock:
+            self._db.execute(
+                "UPDATE leases SET expires_at = ? WHERE store = ? AND app_id = ? AND owner = ?",
+                (time.time() + self.lease_ttl, store, app_id, self.owner)
+            )
+
+    def _release(self, store, app_id):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM leases WHERE store = ? AND app_id = ? AND owner = ?", (store, app_id, self.owner)
+            )
+
+    async def _renew_loop(self, store, app_id):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await asyncio.to_thread(self._renew, store, app_id)
+            except sqlite3.Error as e:
+                log.warning("Не удалось продлить аренду %s:%s: %s", store, app_id, e)
+
+    async def claim(self, store, app_id):
+        """
+        Берёт аренду на сканирование и возвращает None - тогда сканировать
+        должен этот процесс и потом вызвать release(). Если сканирование уже
+        ведёт другой процесс, ждёт его и возвращает путь к его результату.
+        Если владелец закончил без результата или пропал, аренда берётся заново.
+        """
+        waiting_since = time.time()
+        waited = False
+        while True:
+            if await asyncio.to_thread(self._try_acquire, store, app_id):
+                self._renewals[(store, app_id)] = asyncio.create_task(self._renew_loop(store, app_id))
+                metrics.shared_flights.inc(role="owner")
+                return None
+            if not waited:
+                waited = True
+                log.info("Сканирование %s:%s уже идёт в другом процессе, ждём результат", store, app_id)
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+            found = await asyncio.to_thread(self.lookup, store, app_id)
+            if found is not None and found[0] >= waiting_since:
+                metrics.shared_flights.inc(role="follower")
+                return found[1]
+
+    async def release(self, store, app_id):
+        renewal = self._renewals.pop((store, app_id), None)
+        if renewal is not None:
+            renewal.cancel()
+        await asyncio.to_thread(self._release, store, app_id)
+
+    async def stop(self):
+        """
+        Останавливает продление аренд, которые ещё держит процесс, и снимает
+        их, чтобы другие процессы не ждали LEASE_TTL.
+        """
+        renewals, self._renewals = self._renewals, {}
+        for renewal in renewals.values():
+            renewal.cancel()
+        await asyncio.gather(*renewals.values(), return_exceptions=True)
+        for store, app_id in renewals:
+            await asyncio.to_thread(self._release, store, app_id)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+shared_results = SharedResults()
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Модули pricebot читают настройки из config.py при импорте. Если рядом нет
+# настоящего config.py, тестам хватает временного каталога данных
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType("config")
+    config.CONST_TOKEN = "0:test"
+    config.CONST_PATH = tempfile.mkdtemp(prefix="pricebot-tests-")
+    sys.modules["config"] = config
@@ -0,0 +1,63 @@
+import pytest
+
+from pricebot import admission as admission_module
+from pricebot.admission import SATURATED_RETRY_AFTER, AdmissionController
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_user_window_limits_requests(clock):
+    controller = AdmissionController(max_requests=2, period=60, max_active=10)
+
+    assert controller.admit(1, 0) == (True, 0)
+    clock[0] += 10
+    assert controller.admit(1, 0) == (True, 0)
+    clock[0] += 5
+    # Первый запрос выйдет из окна через 60 - 15 = 45 сек
+    assert controller.admit(1, 0) == (False, 45)
+    # Другой пользователь не ограничен чужим окном
+    assert controller.admit(2, 0) == (True, 0)
+
+    clock[0] += 45
+    assert controller.admit(1, 0) == (True, 0)
+
+
+def test_rejected_request_is_not_counted(clock):
+    controller = AdmissionController(max_requests=1, period=60, max_active=10)
+    assert controller.admit(1, 0)[0]
+    for _ in range(5):
+        assert not controller.admit(1, 0)[0]
+    clock[0] += 60
+    assert controller.admit(1, 0) == (True, 0)
+
+
+def test_global_limit_rejects_before_user_window(clock):
+    controller = AdmissionController(max_requests=1, period=60, max_active=3)
+
+    assert controller.admit(1, 3) == (False, SATURATED_RETRY_AFTER)
+    # Отказ по перегрузке не расходует окно пользователя
+    assert controller.admit(1, 2) == (True, 0)
+
+
+def test_cleanup_forgets_idle_users(clock):
+    controller = AdmissionController(max_requests=5, period=60, max_active=10)
+    controller.admit(1, 0)
+    clock[0] += 30
+    controller.admit(2, 0)
+
+    clock[0] += 31
+    controller.cleanup()
+    assert set(controller._requests) == {2}
+
+    # Не чаще раза за окно: через 30 сек окно пользователя 2 уже пусто, но он ещё помнится
+    clock[0] += 30
+    controller.cleanup()
+    assert set(controller._requests) == {2}
+    clock[0] += 30
+    controller.cleanup()
+    assert set(controller._requests) == set()
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from pricebot import convert
+from pricebot.convert import apple_price_parser, convert_prices_batch, google_price_parser
+
+# (строка цены, валюта, min, max, цена уже в USD)
+GOOGLE_CASES = [
+    ("$0.99 - $99.99 per item", "USD", 0.99, 99.99, False),
+    ("$4.99 per item", "USD", 4.99, 4.99, False),
+    ("Rp 15.000 - Rp 1.599.000 per item", "IDR", 15000.0, 1599000.0, False),
+    ("Rp\xa015.000,00 - Rp\xa01.599.000,00 per item", "IDR", 15000.0, 1599000.0, False),
+    ("R 19,99 - R 1 999,99 per item", "ZAR", 19.99, 1999.99, False),
+    ("EGP 49.99 - EGP 4,999.99 per item", "EGP", 49.99, 4999.99, False),
+    ("BRL 5.90 - BRL 599.90 per item", "BRL", 5.9, 599.9, False),
+    ("COP 4,200.00 - COP 419,900.00 per item", "COP", 4200.0, 419900.0, False),
+    ("JOD 0.690 - JOD 69.990 per item", "JOD", 0.69, 69.99, False),
+    ("¥160 - ¥16,000 per item", "JPY", 160.0, 16000.0, False),
+    ("₫26,000 - ₫2,599,000 per item", "VND", 26000.0, 2599000.0, False),
+    # Прежний парсер давал здесь None (не снимал код валюты); новый разбирает
+    ("VND 26,000 per item", "VND", 26000.0, 26000.0, False),
+    ("$1.99 - $9.99 per item; $19.99 per month", "USD", 1.99, 9.99, False),
+]
+
+APPLE_CASES = [
+    ("ج.م.‏ ٤٩٫٩٩", "EGP", 49.99, 49.99, False),
+    ("ج.م.‏ ١٬٢٩٩٫٩٩", "EGP", 1299.99, 1299.99, False),
+    ("R$ 5,90", "BRL", 5.9, 5.9, False),
+    ("R$ 1.299,90", "BRL", 1299.9, 1299.9, False),
+    ("US$ 0,99", "DZD", 0.99, 0.99, True),
+    ("$ 4.900", "COP", 4900.0, 4900.0, False),
+    ("$ 1.290", "CLP", 1290.0, 1290.0, False),
+    ("$9.99", "USD", 9.99, 9.99, True),
+    ("USD 4.99", "EUR", 4.99, 4.99, True),
+]
+
+GARBAGE = ["", "Free", "per item", "—"]
+
+
+@pytest.mark.parametrize("price_str, currency, low, high, is_usd", GOOGLE_CASES)
+def test_google_price_specs(price_str, currency, low, high, is_usd):
+    assert google_price_parser.parse_range(price_str, currency) == (low, high, is_usd)
+
+
+@pytest.mark.parametrize("price_str, currency, low, high, is_usd", APPLE_CASES)
+def test_apple_price_specs(price_str, currency, low, high, is_usd):
+    assert apple_price_parser.parse_range(price_str, currency) == (low, high, is_usd)
+    assert apple_price_parser.parse(price_str, currency) == low
+
+
+@pytest.mark.parametrize("parser", [google_price_parser, apple_price_parser])
+@pytest.mark.parametrize("price_str", GARBAGE)
+def test_garbage_converts_to_zero(parser, price_str):
+    with pytest.raises(ValueError):
+        parser.parse_range(price_str, "USD")
+    min_usd, max_usd = convert_prices_batch(parser, [(price_str, "USD")], {})
+    assert (min_usd[0], max_usd[0]) == (0.0, 0.0)
+
+
+def test_batch_applies_rates_and_usd_prices():
+    items = [("Rp 15.000 - Rp 30.000 per item", "IDR"), ("$4.99 per item", "USD"), ("XYZ 1 per item", "XYZ")]
+    min_usd, max_usd = convert_prices_batch(google_price_parser, items, {"IDR": 15000.0, "USD": 1.0})
+    assert list(min_usd) == [1.0, 4.99, 1.0]
+    assert list(max_usd) == [2.0, 4.99, 1.0]
+
+
+def numpy_free(monkeypatch):
+    real = convert.optional_module
+    monkeypatch.setattr(convert, "optional_module", lambda name: None if name == "numpy" else real(name))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_paths_agree(monkeypatch, seed):
+    rng = random.Random(seed)
+    rates = {"USD": 1.0, "IDR": 15000.0, "EGP": 50.291311, "KWD": 0.30806, "HKD": 8.0}
+    # Половины вроде 716.395 и 3225/15000 = 0.215 - там, где round(x, 2) и np.round расходятся
+    items = [("$716.395 per item", "USD"), ("HK$2797.56 per item", "HKD"), ("Rp 3.225 per item", "IDR")]
+    for _ in range(3 * convert.NUMPY_MIN_BATCH):
+        currency = rng.choice(sorted(rates))
+        amount = round(rng.uniform(0, 5000), rng.choice([0, 2, 3]))
+        items.append((f"{currency} {amount:.3f} - {currency} {amount * 3:.3f} per item", currency))
+    items.append(("garbage", "USD"))
+
+    numpy_result = convert_prices_batch(google_price_parser, items, rates)
+    assert len(items) >= convert.NUMPY_MIN_BATCH
+    small = [
+        convert_prices_batch(google_price_parser, items[start:start + 10], rates)
+        for start in range(0, len(items), 10)
+    ]
+    small_result = tuple([value for part in small for value in part[i]] for i in (0, 1))
+    numpy_free(monkeypatch)
+    python_result = convert_prices_batch(google_price_parser, items, rates)
+
+    for i in (0, 1):
+        assert list(map(float, numpy_result[i])) == small_result[i] == list(python_result[i])
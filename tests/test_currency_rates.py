@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+from pricebot import http_client
+from pricebot.currency_rates import DEFAULT_RATES, RateProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from stub_store import StubStore  # noqa: E402
+
+
+@pytest.fixture
+def provider(tmp_path):
+    return RateProvider(url=None, path=str(tmp_path / "usd_rates.json"))
+
+
+def refresh_against_stub(provider, configure=None):
+    """
+    Поднимает stub-сервер курсов, вызывает refresh() и возвращает его результат.
+    """
+    async def scenario():
+        stub = StubStore({}, latency=0, jitter=0)
+        if configure is not None:
+            configure(stub)
+        await stub.start()
+        provider.url = stub.rates_url
+        try:
+            return await provider.refresh()
+        finally:
+            await http_client.close_session()
+            await stub.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_refresh_swaps_snapshot_and_saves_it(provider):
+    def configure(stub):
+        stub.rates = {"EGP": 48.5, "TRY": 40.0}
+
+    before = provider.rates
+    assert refresh_against_stub(provider, configure)
+
+    assert provider.rates is not before
+    assert provider.rates["EGP"] == 48.5
+    assert provider.rates["TRY"] == 40.0
+    # Валюты, которых нет в ответе, остаются из значений по умолчанию
+    assert provider.rates["BRL"] == DEFAULT_RATES["BRL"]
+    assert provider.updated_at > 0
+    with open(provider.path, encoding='utf-8') as f:
+        assert json.load(f)["usd"]["egp"] == 48.5
+
+
+@pytest.mark.parametrize("configure", [
+    pytest.param(lambda stub: setattr(stub, "error_rate", 1.0), id="http-error"),
+    pytest.param(lambda stub: setattr(stub, "rates", {"EGP": 0, "TRY": "n/a"}), id="bad-payload"),
+])
+def test_failed_refresh_keeps_previous_rates(provider, configure):
+    provider._swap({"EGP": 48.5}, 123.0)
+    before = provider.rates
+
+    assert not refresh_against_stub(provider, configure)
+
+    assert provider.rates is before
+    assert provider.updated_at == 123.0
+    assert not os.path.exists(provider.path)
+
+
+def test_load_snapshot_reads_saved_rates(provider):
+    with open(provider.path, 'w', encoding='utf-8') as f:
+        json.dump({"usd": {"egp": 48.5}}, f)
+
+    provider.load_snapshot()
+
+    assert provider.rates["EGP"] == 48.5
+    assert provider.updated_at == os.path.getmtime(provider.path)
+
+
+@pytest.mark.parametrize("content", [None, "not json", '{"usd": {}}'])
+def test_load_snapshot_falls_back_to_defaults(provider, content):
+    if content is not None:
+        with open(provider.path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    provider.load_snapshot()
+
+    assert dict(provider.rates) == DEFAULT_RATES
+    assert provider.updated_at == 0.0
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pricebot import job_queue
+from pricebot.job_queue import ScanJobQueue
+
+
+def make_queue(tmp_path):
+    return ScanJobQueue(None, None, path=str(tmp_path / "jobs.sqlite3"))
+
+
+def enqueue(queue, user_id, app_id):
+    return asyncio.run(queue.enqueue(user_id, user_id, "google", app_id))
+
+
+def claim_all(queue):
+    claimed = []
+    while (job := queue._claim_next()) is not None:
+        claimed.append((job.user_id, job.app_id))
+    return claimed
+
+
+def test_fair_order_round_robin(tmp_path):
+    queue = make_queue(tmp_path)
+    for user_id, app_id in [(1, "a"), (1, "b"), (1, "c"), (2, "d"), (3, "e")]:
+        enqueue(queue, user_id, app_id)
+
+    assert claim_all(queue) == [(1, "a"), (2, "d"), (3, "e"), (1, "b"), (1, "c")]
+
+
+def test_position_follows_fair_order(tmp_path):
+    queue = make_queue(tmp_path)
+    assert enqueue(queue, 1, "a")[1] == 1
+    assert enqueue(queue, 1, "b")[1] == 2
+    # Второй пользователь обгоняет вторую задачу первого
+    assert enqueue(queue, 2, "c")[1] == 2
+
+
+def test_recently_served_user_goes_last(tmp_path):
+    queue = make_queue(tmp_path)
+    enqueue(queue, 1, "a")
+    assert claim_all(queue) == [(1, "a")]
+
+    enqueue(queue, 1, "b")
+    enqueue(queue, 2, "c")
+    assert claim_all(queue) == [(2, "c"), (1, "b")]
+
+
+def test_held_job_is_not_claimed(tmp_path):
+    queue = make_queue(tmp_path)
+    claimed_while_held = []
+
+    async def on_queued(position):
+        claimed_while_held.append(queue._claim_next())
+
+    asyncio.run(queue.enqueue(1, 1, "google", "a", on_queued=on_queued))
+
+    assert claimed_while_held == [None]
+    assert claim_all(queue) == [(1, "a")]
+
+
+def test_interrupted_jobs_resume(tmp_path):
+    queue = make_queue(tmp_path)
+    enqueue(queue, 1, "a")
+    enqueue(queue, 2, "b")
+    assert queue._claim_next().app_id == "a"
+    queue._db.close()
+
+    # Новый процесс над той же базой: задача в статусе running возвращается в очередь
+    queue = make_queue(tmp_path)
+    assert queue.active == 2
+    assert queue._resume_interrupted() == 1
+    assert sorted(claim_all(queue)) == [(1, "a"), (2, "b")]
+
+
+def test_prune_removes_old_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id, _ = enqueue(queue, 1, "a")
+    queue._claim_next()
+    queue._finish(job_id, None, None)
+
+    queue._prune(2 ** 40)
+
+    assert queue._execute("SELECT COUNT(*) FROM jobs")[0][0] == 0
+    assert queue._execute("SELECT COUNT(*) FROM served")[0][0] == 0
+
+
+def test_default_db_is_per_instance():
+    assert job_queue.INSTANCE_ID in os.path.basename(job_queue.JOBS_DB_PATH)
+
+
+def test_concurrent_claims_take_each_job_once(tmp_path):
+    first = make_queue(tmp_path)
+    second = make_queue(tmp_path)
+    for number in range(40):
+        enqueue(first, number % 5, f"app{number}")
+
+    with ThreadPoolExecutor(4) as pool:
+        claimed = list(pool.map(claim_all, [first, second, first, second]))
+
+    app_ids = [app_id for batch in claimed for _, app_id in batch]
+    assert sorted(app_ids) == sorted(f"app{number}" for number in range(40))
+
+
+def test_failed_insert_is_not_counted(tmp_path):
+    queue = make_queue(tmp_path)
+    queue._db.execute("DROP TABLE jobs")
+
+    with pytest.raises(sqlite3.Error):
+        enqueue(queue, 1, "a")
+
+    assert queue.active == 0
+
+
+def test_failed_announcement_still_releases_job(tmp_path):
+    queue = make_queue(tmp_path)
+
+    async def on_queued(position):
+        raise RuntimeError("telegram is down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(queue.enqueue(1, 1, "google", "a", on_queued=on_queued))
+
+    assert queue.active == 1
+    assert claim_all(queue) == [(1, "a")]
+
+
+def test_drain_waits_for_running_jobs(tmp_path):
+    delivered = []
+
+    async def run_scan(job):
+        await asyncio.sleep(0.05)
+        return None
+
+    async def deliver(job, result, error):
+        delivered.append((job.app_id, error))
+
+    async def scenario():
+        queue = ScanJobQueue(run_scan, deliver, path=str(tmp_path / "jobs.sqlite3"), workers=1)
+        await queue.start()
+        await queue.enqueue(1, 1, "google", "a")
+        await asyncio.sleep(0.01)
+        await queue.drain(timeout=5)
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert delivered == [("a", None)]
+    assert queue.active == 0
+    assert queue._execute("SELECT status FROM jobs")[0][0] == "done"
+
+
+def test_drain_cancels_unfinished_work_and_scans(tmp_path):
+    cancelled = []
+    scans_cancelled = []
+
+    async def run_scan(job):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(job.app_id)
+            raise
+
+    async def cancel_scans():
+        scans_cancelled.append(True)
+
+    async def scenario():
+        queue = ScanJobQueue(
+            run_scan, None, path=str(tmp_path / "jobs.sqlite3"), workers=1, cancel_scans=cancel_scans
+        )
+        await queue.start()
+        await queue.enqueue(1, 1, "google", "a")
+        detached = asyncio.create_task(asyncio.sleep(60))
+        queue.track(detached)
+        await asyncio.sleep(0.01)
+        assert queue.active == 2
+        await queue.drain(timeout=0.05)
+        return queue, detached
+
+    queue, detached = asyncio.run(scenario())
+    assert cancelled == ["a"]
+    assert detached.cancelled()
+    assert scans_cancelled == [True]
+    # Прерванная задача осталась running и вернётся в очередь при следующем старте
+    assert queue._execute("SELECT status FROM jobs")[0][0] == "running"
+    assert make_queue(tmp_path)._resume_interrupted() == 1
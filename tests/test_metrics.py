@@ -0,0 +1,30 @@
+import asyncio
+import socket
+
+from pricebot import metrics
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_second_instance_runs_without_endpoint():
+    port = free_port()
+
+    async def scenario():
+        first = await metrics.start_metrics_server("127.0.0.1", port)
+        try:
+            second = await metrics.start_metrics_server("127.0.0.1", port)
+        finally:
+            await first.cleanup()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is not None
+    assert second is None
+
+
+def test_no_port_no_endpoint():
+    assert asyncio.run(metrics.start_metrics_server("127.0.0.1", None)) is None
@@ -0,0 +1,117 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+
+import config
+from pricebot import output
+from pricebot.output import (
+    APPLE_CSV_COLUMNS, CSV_HEADERS, PRICE_FIELDS, PriceRow, ResultFile, open_writer, render_rows, result_sort_key,
+    save_result,
+)
+
+ROWS = [
+    PriceRow("apple", "1", "US", "USD", "$9.99", 9.99, 9.99, "Gems", "P1M"),
+    PriceRow("apple", "1", "TR", "TRY", "₺99,99", 2.5, 2.5, "Gems", ""),
+    PriceRow("apple", "1", "EG", "EGP", "ج.م.‏ ٤٩٫٩٩", 0.99, 1.5),
+    PriceRow("apple", "1", "AU", "AUD", "$4.99", 2.5, 3.0, "Coins", ""),
+]
+
+
+class RecordingCache:
+    def __init__(self):
+        self.saved = []
+
+    async def put(self, store, app_id, filepath):
+        self.saved.append((store, app_id, filepath))
+
+
+@pytest.fixture
+def result_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "CONST_PATH", str(tmp_path))
+    monkeypatch.setattr(output, "PERSIST_RESULTS", True)
+    cache = RecordingCache()
+    monkeypatch.setattr(output, "result_cache", cache)
+    return cache
+
+
+def read_csv(data):
+    return list(csv.reader(io.StringIO(data.decode('utf-8'))))
+
+
+def test_csv_writer_appends_without_repeating_header(tmp_path):
+    path = str(tmp_path / "out.csv")
+    with open_writer(path) as writer:
+        writer.write_rows(ROWS[:2])
+    with open_writer(path, append=True) as writer:
+        writer.write(ROWS[2])
+
+    with open(path, encoding='utf-8', newline='') as f:
+        lines = list(csv.reader(f))
+    assert lines[0] == [CSV_HEADERS[field] for field in PRICE_FIELDS]
+    assert [line[2] for line in lines[1:]] == ["US", "TR", "EG"]
+
+
+def test_jsonl_writer_keeps_numbers(tmp_path):
+    path = str(tmp_path / "out.jsonl")
+    with open_writer(path) as writer:
+        writer.write_rows(ROWS)
+
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert records[2]["price_str"] == ROWS[2].price_str
+    assert records[0]["min_usd"] == 9.99
+    assert list(records[0]) == list(PRICE_FIELDS)
+
+
+def test_parquet_writer_round_trip(tmp_path, monkeypatch):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(output, "PARQUET_BATCH_ROWS", 3)
+    path = str(tmp_path / "out.parquet")
+    with open_writer(path) as writer:
+        writer.write_rows(ROWS)
+
+    table = pyarrow_parquet.read_table(path)
+    assert table.column("country").to_pylist() == ["US", "TR", "EG", "AU"]
+
+
+def test_sorted_render_is_stable_by_price():
+    data = render_rows(ROWS, "csv", APPLE_CSV_COLUMNS, result_sort_key)
+    countries = [line[2] for line in read_csv(data)[1:]]
+    # TR и AU стоят одинаково: порядок по списку стран, как в итоговом файле
+    assert countries[0] == "EG"
+    assert countries[-1] == "US"
+    assert sorted(countries[1:3]) == ["AU", "TR"]
+
+
+def test_save_result_writes_and_caches(result_cache):
+    result = asyncio.run(save_result("apple", "1", ROWS, APPLE_CSV_COLUMNS))
+
+    assert result.path is not None
+    assert result_cache.saved == [("apple", "1", result.path)]
+    assert len(read_csv(asyncio.run(result.read()))) == len(ROWS) + 1
+
+
+def test_incomplete_result_stays_in_memory(result_cache):
+    result = asyncio.run(save_result("apple", "1", ROWS, APPLE_CSV_COLUMNS, complete=False))
+
+    assert result.path is None
+    assert result_cache.saved == []
+    assert len(read_csv(result.data)) == len(ROWS) + 1
+
+
+def test_failed_write_raises_and_keeps_old_file(result_cache, monkeypatch):
+    old = asyncio.run(save_result("apple", "1", ROWS[:1], APPLE_CSV_COLUMNS))
+    old_data = asyncio.run(old.read())
+
+    def broken_writer(path, fmt=None, columns=PRICE_FIELDS, sort_key=None, append=False):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(output, "open_writer", broken_writer)
+    with pytest.raises(OSError):
+        asyncio.run(save_result("apple", "1", ROWS, APPLE_CSV_COLUMNS))
+
+    assert asyncio.run(ResultFile.from_path(old.path).read()) == old_data
+    assert len(result_cache.saved) == 1
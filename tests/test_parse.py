@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from pricebot.parse import INAPP_MARKER, NOT_FOUND_MARKER, PRICE_RE, PlayPageScanner
+
+
+def make_page(rng, prices, marker):
+    """
+    Страница, похожая на Google Play: мусор, строки в кавычках, цены и маркер.
+    """
+    parts = [f'<div>{"x" * rng.randint(0, 300)}</div>', marker]
+    for price in prices:
+        parts.append(f'["{rng.choice(["a", "ключ", "₽€"])}", "{price}", {rng.randint(0, 9)}]')
+        parts.append(f'"unrelated {"y" * rng.randint(0, 50)}", ')
+    rng.shuffle(parts)
+    return "".join(parts)
+
+
+def random_splits(rng, data):
+    cuts = sorted(rng.sample(range(1, len(data)), min(len(data) - 1, rng.randint(0, 40))))
+    return [data[start:end] for start, end in zip([0] + cuts, cuts + [len(data)])]
+
+
+def expected_prices(page):
+    return list(dict.fromkeys(PRICE_RE.findall(page)))
+
+
+PRICES = ["$0.99 - $99.99 per item", "₽75 - ₽7 490 per item", "1,09 € - 109,99 € per item", "₹10 per item"]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_text_chunks_match_findall(seed):
+    rng = random.Random(seed)
+    page = make_page(rng, rng.sample(PRICES, rng.randint(0, len(PRICES))) * 2, INAPP_MARKER)
+
+    scanner = PlayPageScanner()
+    for chunk in random_splits(rng, page):
+        scanner.feed(chunk)
+
+    assert scanner.prices == expected_prices(page)
+    assert scanner.has_inapp
+    assert not scanner.is_404
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_byte_chunks_split_inside_characters(seed):
+    rng = random.Random(seed)
+    marker = rng.choice([INAPP_MARKER, NOT_FOUND_MARKER])
+    page = make_page(rng, rng.sample(PRICES, rng.randint(1, len(PRICES))), marker)
+
+    scanner = PlayPageScanner()
+    for chunk in random_splits(rng, page.encode("utf-8")):
+        scanner.feed_bytes(chunk)
+    scanner.close()
+
+    assert scanner.prices == expected_prices(page)
+    assert scanner.has_inapp == (marker == INAPP_MARKER)
+    assert scanner.is_404 == (marker == NOT_FOUND_MARKER)
+
+
+def test_one_character_chunks():
+    page = make_page(random.Random(0), PRICES, INAPP_MARKER)
+    scanner = PlayPageScanner()
+    for char in page:
+        scanner.feed(char)
+    assert scanner.prices == expected_prices(page)
+
+
+def test_settled_after_quiet_window_past_last_price():
+    scanner = PlayPageScanner()
+    scanner.feed(f'{INAPP_MARKER} "{PRICES[0]}", ')
+    assert not scanner.is_settled(100)
+
+    scanner.feed("x" * 99)
+    assert not scanner.is_settled(100)
+    scanner.feed("x")
+    assert scanner.is_settled(100)
+
+    # Новая цена сбрасывает окно
+    scanner.feed(f'"{PRICES[1]}", ')
+    assert not scanner.is_settled(100)
+
+
+def test_settled_immediately_on_404():
+    scanner = PlayPageScanner()
+    scanner.feed(NOT_FOUND_MARKER[:20])
+    assert not scanner.is_settled(10 ** 6)
+    scanner.feed(NOT_FOUND_MARKER[20:])
+    assert scanner.is_settled(10 ** 6)
+
+
+def test_not_settled_without_inapp_marker():
+    scanner = PlayPageScanner()
+    scanner.feed(f'"{PRICES[0]}", ' + "x" * 1000)
+    assert not scanner.is_settled(100)
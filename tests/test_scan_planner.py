@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+from pricebot.scan_planner import PLANNER_MIN_SCANS, ScanPlan, ScanPlanner
+
+
+@pytest.fixture
+def planner(tmp_path):
+    return ScanPlanner(path=str(tmp_path / "planner.json"))
+
+
+def test_learn_measures_against_cheapest_history_country(planner):
+    # US пришла из истории: её статистика не трогается, но она остаётся базой
+    planner.learn("google", {"US": 1.0, "DE": 2.0, "TR": 0.5 * math.e}, fetched={"DE", "TR"})
+
+    countries = planner.stats["google"]["countries"]
+    assert "US" not in countries
+    assert countries["DE"][1] == pytest.approx(math.log(2.0))
+    assert countries["TR"][1] == pytest.approx(math.log(0.5 * math.e))
+
+
+def test_learn_skips_scan_without_fetched_countries(planner):
+    planner.learn("google", {"US": 1.0, "DE": 2.0}, fetched=set())
+    assert planner.stats.get("google", {"scans": 0})["scans"] == 0
+
+
+def test_learn_persists_and_orders_by_mean(planner, tmp_path):
+    for _ in range(PLANNER_MIN_SCANS):
+        planner.learn("apple", {"US": 1.0, "DE": 3.0, "TR": 0.5})
+
+    reloaded = ScanPlanner(path=planner.path)
+    assert reloaded.stats["apple"]["scans"] == PLANNER_MIN_SCANS
+    # Страна без статистики идёт первой, остальные - от дешёвых к дорогим
+    assert reloaded.order("apple", ["DE", "US", "NEW", "TR"]) == ["NEW", "TR", "US", "DE"]
+
+
+def test_plan_stops_when_rest_cannot_be_cheaper():
+    stats = {"TR": [5, 0.0, 0.0], "US": [5, math.log(4), 0.0], "DE": [5, math.log(5), 0.0]}
+    plan = ScanPlan(["TR", "US", "DE"], budget=1, stats=stats)
+
+    scanned = []
+    for country in plan:
+        scanned.append(country)
+        plan.record(country, [("USD", "$1", 1.0)])
+
+    assert scanned == ["TR"]
+    assert plan.skipped == ["US", "DE"]
+
+
+def test_plan_keeps_countries_without_statistics():
+    stats = {"TR": [5, 0.0, 0.0]}
+    plan = ScanPlan(["TR", "NEW"], budget=1, stats=stats)
+
+    scanned = []
+    for country in plan:
+        scanned.append(country)
+        plan.record(country, [("USD", "$1", 1.0)])
+
+    assert scanned == ["TR", "NEW"]
+    assert plan.skipped == []
+
+
+def test_plan_without_budget_scans_everything():
+    plan = ScanPlan(["TR", "US"], stats={"TR": [5, 0.0, 0.0], "US": [5, 5.0, 0.0]})
+    assert list(plan) == ["TR", "US"]
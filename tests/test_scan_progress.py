@@ -0,0 +1,131 @@
+import asyncio
+import math
+from datetime import timedelta
+
+from pricebot.scan_progress import DebouncedEditor, ScanProgress, priors_from_history
+
+
+def test_cheapest_takes_lowest_row_per_country():
+    progress = ScanProgress(["US", "TR", "EG"])
+    progress.report("US", [("USD", "$9.99", 9.99), ("USD", "$4.99", 4.99)])
+    progress.report("TR", [("TRY", "₺0", 0.0), ("TRY", "₺99", 2.5)])
+    progress.report("EG", [])
+
+    assert progress.done == {"US", "TR", "EG"}
+    assert progress.cheapest(5) == [(2.5, "TR", "₺99", "TRY"), (4.99, "US", "$4.99", "USD")]
+    assert progress.cheapest(1) == [(2.5, "TR", "₺99", "TRY")]
+
+
+def test_settled_when_rest_is_more_expensive_by_history():
+    latest = {
+        "US": (0, "ok", [("USD", "$9.99", 9.99)]),
+        "TR": (0, "ok", [("TRY", "₺99", 2.0)]),
+        "DE": (0, "noinapp", []),
+    }
+    priors = priors_from_history(latest)
+    assert priors == {"US": 9.99, "TR": 2.0, "DE": math.inf}
+
+    progress = ScanProgress(["TR", "US", "DE", "NEW"], priors)
+    progress.report("TR", [("TRY", "₺99", 2.0)])
+    # NEW без истории может оказаться любой
+    assert not progress.is_settled(1)
+    progress.report("NEW", [("USD", "$5", 5.0)])
+    assert progress.is_settled(1)
+    # US по истории 9.99: даже со скидкой 25% (7.49) дороже второго места (5.0),
+    # а со скидкой 60% (4.0) - уже нет
+    assert progress.is_settled(2)
+    assert not progress.is_settled(2, margin=0.6)
+
+
+def test_listeners_get_every_update():
+    progress = ScanProgress(["US"])
+    seen = []
+
+    def listener(state):
+        seen.append((len(state.done), state.finished))
+
+    progress.subscribe(listener)
+    progress.report("US", [])
+    progress.finish()
+    progress.unsubscribe(listener)
+    progress.finish()
+
+    assert seen == [(0, False), (1, False), (1, True)]
+
+
+def test_from_history_is_finished():
+    latest = {"US": (0, "ok", [("USD", "$1", 1.0)])}
+    progress = ScanProgress.from_history(["US", "TR"], latest)
+    assert progress.finished
+    assert progress.is_settled(5)
+    assert progress.cheapest(5) == [(1.0, "US", "$1", "USD")]
+
+
+class RetryAfter(Exception):
+    def __init__(self, seconds):
+        super().__init__(f"retry after {seconds}")
+        self.retry_after = seconds
+
+
+def test_editor_sends_latest_text_at_most_once_per_interval():
+    sent = []
+
+    async def edit(text):
+        sent.append((asyncio.get_running_loop().time(), text))
+
+    async def scenario():
+        editor = DebouncedEditor(edit, interval=0.1)
+        started = asyncio.get_running_loop().time()
+        for text in ["1", "2", "3"]:
+            editor.update(text)
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.05)
+        editor.update("4")
+        editor.update("5")
+        await editor._task
+        # Тот же текст повторно не отправляется
+        editor.update("5")
+        await editor._task
+        return started
+
+    started = asyncio.run(scenario())
+    # Первая правка сразу, промежуточные тексты пропущены, последняя - через interval
+    assert [text for _, text in sent] == ["1", "5"]
+    assert sent[1][0] - started >= 0.09
+
+
+def test_editor_waits_out_retry_after():
+    sent = []
+    failures = [RetryAfter(timedelta(seconds=0.1))]
+
+    async def edit(text):
+        if failures:
+            raise failures.pop()
+        sent.append((asyncio.get_running_loop().time(), text))
+
+    async def scenario():
+        editor = DebouncedEditor(edit, interval=0)
+        started = asyncio.get_running_loop().time()
+        editor.update("progress")
+        await editor._task
+        return started
+
+    started = asyncio.run(scenario())
+    assert [text for _, text in sent] == ["progress"]
+    assert sent[0][0] - started >= 0.09
+
+
+def test_editor_gives_up_on_other_errors():
+    calls = []
+
+    async def edit(text):
+        calls.append(text)
+        raise RuntimeError("message is not modified")
+
+    async def scenario():
+        editor = DebouncedEditor(edit, interval=0)
+        editor.update("a")
+        await editor._task
+
+    asyncio.run(scenario())
+    assert calls == ["a"]
@@ -0,0 +1,106 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+from pricebot import shared_cache
+from pricebot.shared_cache import HOSTNAME, SharedResults
+
+
+@pytest.fixture(autouse=True)
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(shared_cache, "LEASE_POLL_INTERVAL", 0.01)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    opened = [SharedResults(path), SharedResults(path)]
+    yield opened
+    for store in opened:
+        store.close()
+
+
+def put_lease(store, owner, expires_at):
+    store._db.execute(
+        "INSERT OR REPLACE INTO leases (store, app_id, owner, expires_at) VALUES (?, ?, ?, ?)",
+        ("google", "app", owner, expires_at)
+    )
+
+
+def lease_owner(store):
+    row = store._db.execute("SELECT owner FROM leases WHERE store = 'google' AND app_id = 'app'").fetchone()
+    return row and row[0]
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_follower_waits_for_owner_result(stores):
+    owner, follower = stores
+
+    async def scenario():
+        assert await owner.claim("google", "app") is None
+        waiting = asyncio.create_task(follower.claim("google", "app"))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        owner.publish("google", "app", "/results/app.csv")
+        await owner.release("google", "app")
+        return await asyncio.wait_for(waiting, 1)
+
+    assert asyncio.run(scenario()) == "/results/app.csv"
+
+
+def test_released_lease_without_result_is_claimed_again(stores):
+    owner, follower = stores
+
+    async def scenario():
+        await owner.claim("google", "app")
+        waiting = asyncio.create_task(follower.claim("google", "app"))
+        await asyncio.sleep(0.05)
+        await owner.release("google", "app")
+        result = await asyncio.wait_for(waiting, 1)
+        await follower.stop()
+        return result
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_lease_of_dead_local_process_is_taken_over(stores):
+    _, store = stores
+    put_lease(store, f"{HOSTNAME}:{dead_pid()}:deadbeef", time.time() + 3600)
+
+    async def scenario():
+        result = await asyncio.wait_for(store.claim("google", "app"), 1)
+        assert lease_owner(store) == store.owner
+        await store.stop()
+        return result
+
+    assert asyncio.run(scenario()) is None
+    assert lease_owner(store) is None
+
+
+def test_live_foreign_lease_blocks_until_expired(stores):
+    _, store = stores
+    put_lease(store, "other-host:1:deadbeef", time.time() + 3600)
+
+    async def blocked():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(store.claim("google", "app"), 0.1)
+
+    asyncio.run(blocked())
+    assert lease_owner(store) == "other-host:1:deadbeef"
+
+    put_lease(store, "other-host:1:deadbeef", time.time() - 1)
+
+    async def expired():
+        result = await asyncio.wait_for(store.claim("google", "app"), 1)
+        await store.stop()
+        return result
+
+    assert asyncio.run(expired()) is None